@@ -67,6 +67,14 @@ class IndexDocumentResponse(BaseModel):
     message: str
     file_path: str
 
+class IndexDocumentsRequest(BaseModel):
+    file_paths: List[str]
+
+class IndexDocumentsResponse(BaseModel):
+    success: bool
+    message: str
+    file_paths: List[str]
+
 class HealthResponse(BaseModel):
     status: str
     version: str
@@ -283,6 +291,35 @@ async def index_document(request: IndexDocumentRequest):
         logger.error(f"❌ Index error: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error indexing document: {str(e)}")
 
+@app.post("/api/index-documents", response_model=IndexDocumentsResponse)
+async def index_documents(request: IndexDocumentsRequest):
+    """
+    Index several documents, parsing the next file while the current one is embedded
+    """
+    try:
+        logger.info(f"📄 Indexing {len(request.file_paths)} documents")
+        
+        if not file_tools:
+            raise HTTPException(status_code=503, detail="File tools not initialized")
+        
+        result = file_tools.index_documents(request.file_paths)
+        
+        success = "❌" not in result
+        
+        logger.info(f"{'✅' if success else '❌'} Batch indexing {'successful' if success else 'had failures'}")
+        
+        return IndexDocumentsResponse(
+            success=success,
+            message=result,
+            file_paths=request.file_paths
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Index error: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Error indexing documents: {str(e)}")
+
 # List indexed documents
 @app.get("/api/indexed-documents", response_model=ListDocumentsResponse)
 async def list_indexed_documents():
@@ -6,6 +6,7 @@ import os
 import sys
 import uuid
 import psutil
+from datetime import datetime
 from typing import Dict, Any
 
 # Add project root to path
@@ -40,8 +41,7 @@ class StreamlitApp:
             st.session_state.root_dir = self.app_config["default_root_dir"]
         
         if "thread_id" not in st.session_state:
-            import uuid
-            st.session_state.thread_id = str(uuid.uuid4())[:8]
+            st.session_state.thread_id = uuid.uuid4().hex[:8]
         
         if "current_directory" not in st.session_state:
             st.session_state.current_directory = self.app_config["default_root_dir"]
@@ -162,15 +162,21 @@ class StreamlitApp:
             MainUI.display_error_message("Agent not initialized")
             return
 
-        # Add user message to history
-        st.session_state.chat_history.append({
+        # Session state goes through Streamlit's proxy; look the history up once
+        history = st.session_state.chat_history
+        
+        # Add user message to history; only this turn is redrawn live
+        turn_start = len(history)
+        history.append({
             "type": "human",
-            "content": user_input
+            "content": user_input,
+            "ts": datetime.now().strftime("%H:%M"),
+            "id": uuid.uuid4().hex
         })
 
         if chat_placeholder is not None:
             with chat_placeholder.container():
-                ChatUI.display_chat_history(st.session_state.chat_history)
+                ChatUI.display_chat_history(history[turn_start:])
 
         # Add typing indicator to history
         typing_id = str(uuid.uuid4())
@@ -178,11 +184,11 @@ class StreamlitApp:
             "type": "typing",
             "id": typing_id
         }
-        st.session_state.chat_history.append(typing_message)
+        history.append(typing_message)
 
         if chat_placeholder is not None:
             with chat_placeholder.container():
-                ChatUI.display_chat_history(st.session_state.chat_history)
+                ChatUI.display_chat_history(history[turn_start:])
 
         try:
             response = st.session_state.agent.process_message(
@@ -191,26 +197,29 @@ class StreamlitApp:
             )
         except Exception as exc:
             # Remove typing indicator
-            if st.session_state.chat_history and st.session_state.chat_history[-1].get("type") == "typing":
-                st.session_state.chat_history.pop()
+            if history and history[-1].get("type") == "typing":
+                history.pop()
             else:
-                st.session_state.chat_history = [msg for msg in st.session_state.chat_history if msg.get("type") != "typing"]
+                history[:] = [msg for msg in history if msg.get("type") != "typing"]
 
-            st.session_state.chat_history.append({
+            history.append({
                 "type": "error",
-                "content": f"Error processing message: {str(exc)}"
+                "content": f"Error processing message: {str(exc)}",
+                "ts": datetime.now().strftime("%H:%M"),
+                "id": uuid.uuid4().hex
             })
 
             if chat_placeholder is not None:
                 with chat_placeholder.container():
-                    ChatUI.display_chat_history(st.session_state.chat_history)
+                    ChatUI.display_chat_history(history[turn_start:])
             return
 
         # Remove typing indicator after successful response
-        if st.session_state.chat_history and st.session_state.chat_history[-1].get("type") == "typing":
-            st.session_state.chat_history.pop()
+        reply_ts = datetime.now().strftime("%H:%M")
+        if history and history[-1].get("type") == "typing":
+            history.pop()
         else:
-            st.session_state.chat_history = [msg for msg in st.session_state.chat_history if msg.get("type") != "typing"]
+            history[:] = [msg for msg in history if msg.get("type") != "typing"]
 
         if response["success"]:
             # Update thread_id if it was auto-generated
@@ -221,33 +230,37 @@ class StreamlitApp:
             ai_responses = [resp for resp in response["responses"] if resp["type"] == "ai"]
             if ai_responses:
                 combined_content = "\n\n".join([resp["content"] for resp in ai_responses])
-                st.session_state.chat_history.append({
+                history.append({
                     "type": "ai",
-                    "content": combined_content
+                    "content": combined_content,
+                    "ts": reply_ts,
+                    "id": uuid.uuid4().hex
                 })
 
             # Add any non-AI responses (like errors) separately
             for resp in response["responses"]:
                 if resp["type"] not in ["human", "ai"]:
-                    st.session_state.chat_history.append(resp)
+                    history.append({**resp, "ts": reply_ts, "id": uuid.uuid4().hex})
         else:
             # For unsuccessful responses, still consolidate AI messages
             ai_responses = [resp for resp in response["responses"] if resp["type"] == "ai"]
             if ai_responses:
                 combined_content = "\n\n".join([resp["content"] for resp in ai_responses])
-                st.session_state.chat_history.append({
+                history.append({
                     "type": "ai",
-                    "content": combined_content
+                    "content": combined_content,
+                    "ts": reply_ts,
+                    "id": uuid.uuid4().hex
                 })
 
             # Add any error or other messages
             for resp in response["responses"]:
                 if resp["type"] not in ["human", "ai"]:
-                    st.session_state.chat_history.append(resp)
+                    history.append({**resp, "ts": reply_ts, "id": uuid.uuid4().hex})
 
         if chat_placeholder is not None:
             with chat_placeholder.container():
-                ChatUI.display_chat_history(st.session_state.chat_history)
+                ChatUI.display_chat_history(history[turn_start:])
     
     def run(self):
         """Main application run method with modern UI."""
@@ -272,16 +285,16 @@ class StreamlitApp:
         # Display available drives section
         self.display_drives_section()
         
-        # Chat history with modern styling
-        chat_placeholder = st.empty()
-        with chat_placeholder.container():
-            ChatUI.display_chat_history(st.session_state.chat_history)
+        # Chat history with modern styling (a fragment, so "Load earlier" does
+        # not rerun the whole page)
+        ChatUI.display_chat_fragment()
         
         # Chat input at bottom
         user_input = ChatUI.get_user_input("Type your message here...")
         
         if user_input:
-            self.process_user_message(user_input, chat_placeholder)
+            # The in-flight turn is drawn below the history until the rerun
+            self.process_user_message(user_input, st.empty())
             st.rerun()
     # Layout handled via global styles
 
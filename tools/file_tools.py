@@ -2,26 +2,52 @@ import base64
 """
 File management and shell tools for the AI agent.
 """
+import asyncio
+import ctypes
+import gc
+import glob
+import hashlib
+import io
+import json
+import logging
 import os
+import queue
+import re
+import shelve
+import sys
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from langchain_community.tools import ShellTool
 from langchain_community.agent_toolkits import FileManagementToolkit
 from langchain_core.tools import tool
-from typing import List
+from typing import List, Optional
 from langchain_core.documents import Document
 from langchain_chroma import Chroma
 from langchain_openai import OpenAIEmbeddings
-from langchain_community.document_loaders import PyMuPDFLoader, Docx2txtLoader
+from langchain_community.document_loaders import Docx2txtLoader
+from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import UnstructuredExcelLoader
 import requests
 from langchain_core.messages import HumanMessage
 from langchain_openai import ChatOpenAI
 from langchain_community.document_loaders import UnstructuredPowerPointLoader
-from utils.sementic_search_engine import Detect_and_Create_file_VStore, get_cached_hf_embeddings, clear_global_hf_cache
+from PIL import Image
+import numpy as np
+import fitz  # PyMuPDF
+import xxhash
+from utils.sementic_search_engine import Detect_and_Create_file_VStore, get_cached_hf_embeddings, clear_global_hf_cache, read_metadata_count
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Add HuggingFace embeddings support
 try:
     from langchain_huggingface import HuggingFaceEmbeddings
@@ -43,22 +69,278 @@ except ImportError:
     EXCEL_DEPS_AVAILABLE = False
     print("[WARNING] pandas or openpyxl not installed. Excel file reading will be limited.")
 
+# Optional: pyarrow writes sheet data as CSV in native code
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+# Optional: python-calamine, a direct Rust reader for xlsx/xls/xlsb
+try:
+    from python_calamine import CalamineWorkbook
+    CALAMINE_AVAILABLE = True
+except ImportError:
+    CALAMINE_AVAILABLE = False
+
+# Optional: polars with the Rust calamine engine (needs fastexcel) is the fastest Excel reader
+try:
+    import polars as pl
+    import fastexcel  # backs polars' calamine engine
+    POLARS_AVAILABLE = True
+except ImportError:
+    POLARS_AVAILABLE = False
+
+# Longest image side sent to the vision model; larger images are downscaled before upload
+OCR_MAX_IMAGE_SIDE = 1568
+OCR_JPEG_QUALITY = 85
+
+# pybase64 is a SIMD-accelerated drop-in for base64; fall back to the stdlib when absent
+try:
+    from pybase64 import b64encode_as_string as _b64encode_str
+except ImportError:
+    def _b64encode_str(data) -> str:
+        return base64.b64encode(data).decode("ascii")
+
+# Documents above this size are read and embedded in bounded batches instead of all at once
+STREAM_INDEX_FILE_SIZE = 20 << 20  # 20 MB
+
+# Last-resort limit - documents above it are not indexed at all
+MAX_INDEX_FILE_SIZE = 512 << 20  # 512 MB
+
+# Types the size limits apply to; spreadsheets have their own streaming, cell-capped readers
+_SIZE_LIMITED_EXTS = frozenset({'.pdf', '.docx', '.doc', '.txt'})
+
+# Chunks embedded and inserted per round when streaming a large document
+STREAM_INDEX_BATCH_CHUNKS = 1000
+
+# Characters read per block when streaming a large text file
+TEXT_STREAM_BLOCK_CHARS = 1 << 20
+
+# Number of loaded-but-not-yet-embedded documents buffered when indexing several files
+INDEX_PREFETCH_DEPTH = 2
+
+# Embedding requests in flight at once when indexing a document
+EMBED_MAX_CONCURRENCY = 8
+
+# Background event loop for async embedding calls, started on first use
+_ASYNC_LOOP = None
+_ASYNC_LOOP_LOCK = threading.Lock()
+
+# Concurrent unlinks when deleting the session vectorstore directory
+RMTREE_MAX_WORKERS = 8
+
+# Longest snippet returned per search_files_tool hit
+SEARCH_SNIPPET_CHARS = 400
+
+# Vision-model requests in flight at once when OCR-ing a scanned PDF
+OCR_MAX_WORKERS = 8
+
+# Largest amount of row data (characters) in one Excel chunk; rows are never split
+EXCEL_CHUNK_CHARS = 4000
+
+# Cells of each sheet written into the index; rows beyond it are counted but not shown
+EXCEL_MAX_CELLS_PER_SHEET = 50_000
+
+# Parsed workbooks kept in memory, keyed by (path, fingerprint) so edited files are re-read
+EXCEL_CACHE_SIZE = 32
+_EXCEL_CACHE = OrderedDict()
+_EXCEL_CACHE_LOCK = threading.Lock()
+
+_COUNTING_QUERY_RE = re.compile(r"how many|count|total|number of|how much")
+# Sections that carry row counts or totals, shown first for counting queries
+_COUNT_MARKER_RE = re.compile(r"SUMMARY|Rows:|Total")
+_SPREADSHEET_EXTS = frozenset({'.xlsx', '.xls', '.xlsb', '.csv'})
+
 class FileTools:
     """Wrapper class for file management tools."""
     
+    # Chunks per Chroma insert when indexing a document
+    INDEX_BATCH_SIZE = 200
+    
+    # Indexed documents whose Chroma handle stays open; older ones are reopened on demand
+    MAX_OPEN_DOCUMENT_VECTORSTORES = 8
+    
+    # Documents with fewer chunks are searched in memory with NumPy instead of Chroma's HNSW index
+    SMALL_DOCUMENT_CHUNKS = 500
+    
+    # Documents shorter than this are answered with their full text instead of a similarity search
+    FULL_CONTENT_MAX_CHARS = 8000
+    
     def __init__(self, root_dir: str = "C:\\", use_hf_embeddings: bool = True):
         self.root_dir = root_dir
         self.use_hf_embeddings = use_hf_embeddings
         self.shell_tool = ShellTool()
         self.toolkit = FileManagementToolkit(root_dir=self.root_dir)
         self.file_management_tools = self.toolkit.get_tools()
+        self._vs_verified = False
         self.vectorstore = self.get_vectorstore()
         
+        # Hits of the last search_files_tool call, looked up by search_files_detailed_tool
+        self._last_search_results = []
+        
         # Session-based document vectorstores (persistent)
-        self.document_vectorstores = {}  # {file_path: vectorstore}
+        self.document_vectorstores = OrderedDict()  # {file_path: vs_info}, least recently used first
         self.session_persist_dir = "./session_vectorstores"
         os.makedirs(self.session_persist_dir, exist_ok=True)
+        
+        # Remove session directories a previous cleanup had to move aside while files were locked
+        for leftover_dir in glob.glob(f"{glob.escape(self.session_persist_dir)}.del_*"):
+            _fast_rmtree(leftover_dir)
+        
+        # Created on first use and shared by all document vectorstores
+        self._document_embeddings = None
+        
+        # Chunk embeddings keyed by content hash, opened on first use
+        self._embedding_cache = None
+        self._embedding_cache_lock = threading.Lock()
+        
+        # Restore documents indexed by a previous run that did not clean up its session
+        self.document_registry_file = os.path.join(self.session_persist_dir, "registry.json")
+        self._load_document_registry()
 
+    def _load_document_registry(self):
+        """Register documents from a previous run whose files and collections are unchanged."""
+        if not os.path.exists(self.document_registry_file):
+            return
+        
+        try:
+            with open(self.document_registry_file, 'r', encoding='utf-8') as f:
+                registry = json.load(f)
+        except Exception as e:
+            logger.warning("Could not read document registry: %s", e)
+            return
+        
+        for file_path, info in registry.items():
+            try:
+                if not os.path.isdir(info['persist_path']) or _file_fingerprint(file_path) != info['fingerprint']:
+                    continue
+            except (OSError, KeyError):
+                continue
+            
+            # The Chroma handle is opened lazily on first use
+            self.document_vectorstores[file_path] = {
+                'vectorstore': None,
+                'persist_path': info['persist_path'],
+                'doc_count': info['doc_count'],
+                'total_chars': info.get('total_chars'),
+                'fingerprint': info['fingerprint']
+            }
+        
+        if self.document_vectorstores:
+            logger.info("Restored %d previously indexed documents", len(self.document_vectorstores))
+    
+    def _save_document_registry(self):
+        """Write the indexed document registry, replacing the old file atomically."""
+        registry = {
+            file_path: {
+                'persist_path': vs_info['persist_path'],
+                'doc_count': vs_info['doc_count'],
+                'total_chars': vs_info.get('total_chars'),
+                'fingerprint': vs_info['fingerprint']
+            }
+            for file_path, vs_info in self.document_vectorstores.items()
+        }
+        
+        tmp_file = self.document_registry_file + ".tmp"
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(registry, f, indent=2)
+            os.replace(tmp_file, self.document_registry_file)
+        except Exception as e:
+            logger.warning("Could not save document registry: %s", e)
+    
+    @property
+    def document_embeddings(self):
+        """OpenAI embeddings for indexed documents, shared so HTTP connections are reused."""
+        if self._document_embeddings is None:
+            self._document_embeddings = OpenAIEmbeddings(model="text-embedding-3-small", api_key=os.getenv("OPENAI_API_KEY"))
+        return self._document_embeddings
+    
+    def _open_document_vectorstore(self, persist_path: str):
+        """Open the Chroma collection stored for an indexed document."""
+        return Chroma(
+            collection_name=os.path.basename(persist_path),
+            embedding_function=self.document_embeddings,
+            persist_directory=persist_path
+        )
+    
+    def _get_document_vectorstore(self, file_path: str):
+        """Return the vectorstore of an indexed document, reopening it if it was evicted."""
+        vs_info = self.document_vectorstores[file_path]
+        self.document_vectorstores.move_to_end(file_path)
+        
+        if vs_info.get('vectorstore') is None:
+            logger.debug("Reopening evicted vectorstore: %s", vs_info['persist_path'])
+            vs_info['vectorstore'] = self._open_document_vectorstore(vs_info['persist_path'])
+            if vs_info['doc_count'] < self.SMALL_DOCUMENT_CHUNKS:
+                stored = vs_info['vectorstore']._collection.get(include=["embeddings", "documents", "metadatas"])
+                chunks = [Document(page_content=text, metadata=_intern_metadata(metadata))
+                          for text, metadata in zip(stored['documents'], stored['metadatas'])]
+                vs_info['vectors'] = _normalized_matrix(stored['embeddings'])
+                vs_info['chunks'] = chunks
+            self._evict_document_vectorstores()
+        
+        return vs_info['vectorstore']
+    
+    def _evict_document_vectorstores(self):
+        """Close the least recently used vectorstore handles beyond the open limit."""
+        open_paths = [p for p, info in self.document_vectorstores.items() if info.get('vectorstore') is not None]
+        for evict_path in open_paths[:-self.MAX_OPEN_DOCUMENT_VECTORSTORES]:
+            logger.debug("Closing least recently used vectorstore: %s", evict_path)
+            vs_info = self.document_vectorstores[evict_path]
+            vs_info['vectorstore'] = None
+            vs_info.pop('vectors', None)
+            vs_info.pop('chunks', None)
+            _release_chroma_systems(vs_info['persist_path'])
+    
+    def _search_document(self, file_path: str, vectorstore, query: str, k: int) -> List[Document]:
+        """Similarity search over an indexed document, in memory for small documents."""
+        vs_info = self.document_vectorstores[file_path]
+        vectors = vs_info.get('vectors')
+        if vectors is None:
+            return vectorstore.similarity_search(query, k=k)
+        
+        # Rows are L2-normalized, so one matrix-vector product gives the cosine scores
+        query_vector = np.asarray(vectorstore.embeddings.embed_query(query), dtype=np.float32)
+        query_vector /= np.linalg.norm(query_vector) or 1.0
+        scores = vectors @ query_vector
+        
+        k = min(k, len(scores))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [vs_info['chunks'][i] for i in top]
+    
+    def _embed_with_cache(self, embeddings, texts: List[str]) -> List[List[float]]:
+        """Embed texts, reusing vectors for chunks that were already embedded with the same model."""
+        model_name = getattr(embeddings, 'model', type(embeddings).__name__)
+        keys = [hashlib.sha256(f"{model_name}\n{text}".encode('utf-8')).hexdigest() for text in texts]
+        
+        with self._embedding_cache_lock:
+            if self._embedding_cache is None:
+                self._embedding_cache = shelve.open(os.path.join(self.session_persist_dir, "emb_cache.db"))
+            vectors = [self._embedding_cache.get(key) for key in keys]
+        
+        # Embed each distinct missing chunk once
+        uncached = {}
+        for key, text, vector in zip(keys, texts, vectors):
+            if vector is None:
+                uncached.setdefault(key, text)
+        
+        logger.debug("Embedding cache: %s hits, %s chunks to embed", len(texts) - vectors.count(None), len(uncached))
+        
+        if uncached:
+            new_vectors = dict(zip(uncached, _embed_texts_concurrently(embeddings, list(uncached.values()), self.INDEX_BATCH_SIZE)))
+            with self._embedding_cache_lock:
+                self._embedding_cache.update(new_vectors)
+                self._embedding_cache.sync()
+            vectors = [vector if vector is not None else new_vectors[key] for key, vector in zip(keys, vectors)]
+        
+        return vectors
+    
     def get_hf_embeddings(self):
         """Get HuggingFace embeddings model with global caching."""
         return get_cached_hf_embeddings()
@@ -86,22 +368,26 @@ class FileTools:
 
     def get_vectorstore(self):
         """Get or create vectorstore with proper cleanup to avoid lock issues."""
+        # Already opened and verified in this process
+        if self._vs_verified:
+            return self.vectorstore
+        
         chroma_instance = None
         
         try:
             # Choose embedding based on configuration
             if self.use_hf_embeddings and HF_EMBEDDINGS_AVAILABLE:
                 embeddings = self.get_hf_embeddings()
-                print("[VERBOSE] Using HuggingFace embeddings")
+                logger.debug("Using HuggingFace embeddings")
             else:
                 embeddings = OpenAIEmbeddings()
-                print("[VERBOSE] Using OpenAI embeddings")
+                logger.debug("Using OpenAI embeddings")
             
             # Check if database directory and metadata exist
             db_exists = os.path.exists("./chroma_db")
             metadata_exists = os.path.exists("./file_metadata.json")
             
-            print(f"[VERBOSE] Database check - DB exists: {db_exists}, Metadata exists: {metadata_exists}")
+            logger.debug("Database check - DB exists: %s, Metadata exists: %s", db_exists, metadata_exists)
             
             # Only try to open if both exist
             if db_exists and metadata_exists:
@@ -116,40 +402,47 @@ class FileTools:
                     # Verify the vectorstore has content
                     collection_count = chroma_instance._collection.count()
                     
-                    print(f"[VERBOSE] Existing vectorstore found with {collection_count:,} documents")
+                    logger.debug("Existing vectorstore found with %d documents", collection_count)
                     
                     # Only rebuild if truly empty (less than 10 documents is suspicious)
                     if collection_count < 10:
-                        print("[VERBOSE] Vectorstore has very few documents, checking metadata...")
+                        # Metadata last written before the DB cannot have drifted from it - skip reading it
+                        sqlite_file = os.path.join("./chroma_db", "chroma.sqlite3")
+                        metadata_is_newer = (
+                            not os.path.exists(sqlite_file)
+                            or os.path.getmtime("./file_metadata.json") > os.path.getmtime(sqlite_file)
+                        )
                         
-                        # Check metadata to decide
-                        try:
-                            with open("./file_metadata.json", 'r') as f:
-                                import json
-                                metadata = json.load(f)
-                                metadata_count = len(metadata)
-                            
-                            print(f"[VERBOSE] Metadata shows {metadata_count:,} files should be indexed")
+                        if metadata_is_newer:
+                            logger.debug("Vectorstore has very few documents, checking metadata...")
                             
-                            # If metadata has many files but vectorstore is empty, it's corrupted
-                            if metadata_count > 100 and collection_count < 10:
-                                print("[WARNING] Vectorstore appears corrupted (metadata mismatch)")
-                                raise Exception("Corrupted vectorstore - metadata mismatch")
-                            elif collection_count == 0:
-                                print("[WARNING] Vectorstore is completely empty")
-                                raise Exception("Empty vectorstore")
-                        except FileNotFoundError:
-                            print("[WARNING] Metadata file not found")
-                            raise Exception("Missing metadata file")
+                            # Check metadata to decide
+                            try:
+                                metadata_count = read_metadata_count("./file_metadata.json")
+                                
+                                logger.debug("Metadata shows %d files should be indexed", metadata_count)
+                                
+                                # If metadata has many files but vectorstore is empty, it's corrupted
+                                if metadata_count > 100 and collection_count < 10:
+                                    print("[WARNING] Vectorstore appears corrupted (metadata mismatch)")
+                                    raise Exception("Corrupted vectorstore - metadata mismatch")
+                            except FileNotFoundError:
+                                print("[WARNING] Metadata file not found")
+                                raise Exception("Missing metadata file")
+                        
+                        if collection_count == 0:
+                            print("[WARNING] Vectorstore is completely empty")
+                            raise Exception("Empty vectorstore")
                     
                     # Vectorstore is valid and has content - just return it!
                     print(f"[OK] ✅ Using existing vectorstore with {collection_count:,} documents")
                     print(f"[OK] 🚀 No rebuild needed - vectorstore is ready!")
                     self.vectorstore = chroma_instance
+                    self._vs_verified = True
                     return chroma_instance
                     
                 except Exception as verify_error:
-                    print(f"[VERBOSE] Vectorstore verification failed: {str(verify_error)}")
+                    logger.warning("Vectorstore verification failed: %s", verify_error)
                     
                     # Close this instance before rebuilding
                     if chroma_instance:
@@ -157,19 +450,16 @@ class FileTools:
                         chroma_instance = None
                     
                     # Force cleanup
-                    import gc
                     gc.collect()
-                    import time
-                    time.sleep(1)
                     
                     # Re-raise to trigger rebuild
                     raise verify_error
             else:
-                print("[VERBOSE] Database or metadata missing - need to create new vectorstore")
+                logger.debug("Database or metadata missing - need to create new vectorstore")
                 raise Exception("Database files not found")
                 
         except Exception as e:
-            print(f"[VERBOSE] Need to create/rebuild vectorstore: {str(e)}")
+            logger.debug("Need to create/rebuild vectorstore: %s", e)
             
             # Make sure any open instance is closed
             if chroma_instance:
@@ -177,17 +467,24 @@ class FileTools:
                 chroma_instance = None
             
             # Force cleanup
-            import gc
-            import time
             gc.collect()
-            time.sleep(1)
             
             # Now create the detector and run pipeline
-            print("[VERBOSE] Creating new vectorstore with file detector...")
-            detector = Detect_and_Create_file_VStore(use_hf_embeddings=self.use_hf_embeddings)
+            logger.debug("Creating new vectorstore with file detector...")
             
-            # The detector will handle whether to do full rebuild or incremental
-            vs = detector.run_pipeline()
+            # Chroma may hold its file locks briefly after the old instance is released - retry with backoff
+            for attempt in range(3):
+                try:
+                    detector = Detect_and_Create_file_VStore(use_hf_embeddings=self.use_hf_embeddings)
+                    
+                    # The detector will handle whether to do full rebuild or incremental
+                    vs = detector.run_pipeline()
+                    break
+                except PermissionError as lock_error:
+                    if attempt == 2:
+                        raise
+                    logger.debug("Vectorstore still locked, retrying: %s", lock_error)
+                    time.sleep(0.1 * 2 ** attempt)
             detector.start_background_updates()
             
             self.detector = detector
@@ -201,11 +498,32 @@ class FileTools:
             """Search files using semantic search engine."""
             try:
                 results = self.vectorstore.similarity_search(query, k=10)
-                result_summaries = [doc.page_content for doc in results]
-                return "\n\n".join(result_summaries)
+                self._last_search_results = results
+                # Bounded snippets keep the tool output (and the agent's next prompt) small
+                return "\n\n".join(f"[{i}] {doc.page_content[:SEARCH_SNIPPET_CHARS]}" for i, doc in enumerate(results))
             except Exception as e:
                 error_msg = f"Error searching files: {str(e)}"
-                print(f"[VERBOSE] {error_msg}")
+                logger.warning(error_msg)
+                return error_msg
+        
+        @tool
+        def search_files_detailed_tool(idx: int) -> str:
+            """Get the full content and details of one result of the last search_files_tool call, by its [idx] number."""
+            try:
+                results = self._last_search_results
+                if not 0 <= idx < len(results):
+                    return f"❌ No result at position {idx} - the last search returned {len(results)} results"
+                
+                hit = results[idx]
+                file_path = hit.metadata.get("path", hit.page_content)
+                details = f"📄 Content:\n{hit.page_content}\n\n🏷️ Metadata: {hit.metadata}\n📁 Path: {file_path}"
+                if os.path.isfile(file_path):
+                    stat = os.stat(file_path)
+                    details += f"\n📊 Size: {stat.st_size:,} bytes\n🕒 Modified: {datetime.fromtimestamp(stat.st_mtime):%Y-%m-%d %H:%M}"
+                return details
+            except Exception as e:
+                error_msg = f"Error getting search result details: {str(e)}"
+                logger.warning(error_msg)
                 return error_msg
         
         # Create document query tool with self bound
@@ -219,6 +537,11 @@ class FileTools:
             """Index a document for querying. Call this first before querying a document. Returns the indexed document info."""
             return self.index_document(file_path)
         
+        @tool
+        def index_multiple_documents_tool(file_paths: List[str]) -> str:
+            """Index several documents at once for querying. Faster than calling index_document_tool for each file. Returns the indexed documents info."""
+            return self.index_documents(file_paths)
+        
         @tool
         def list_indexed_documents_tool() -> str:
             """List all documents currently indexed in this session. Use this to see what documents are available for querying."""
@@ -234,10 +557,12 @@ class FileTools:
             self.file_management_tools[6],  # List directory tool
             open_file_tool,
             index_document_tool,  # New: Index document
+            index_multiple_documents_tool,  # Index several documents with overlapped loading
             query_document_tool,  # New: Query indexed document
             list_indexed_documents_tool,  # New: List indexed documents
             get_full_document_content_tool,  # New: Get complete document
             search_files_tool,
+            search_files_detailed_tool,
             extract_image_text
         ]
     
@@ -297,32 +622,23 @@ class FileTools:
                     f"💡 Use index_document first."
                 )
             
-            print(f"[VERBOSE] Getting full content of: {file_path}")
+            logger.debug("Getting full content of: %s", file_path)
             
             # Get vectorstore
-            vs_info = self.document_vectorstores[file_path]
-            vectorstore = vs_info['vectorstore']
+            vectorstore = self._get_document_vectorstore(file_path)
             
-            # Get ALL documents from vectorstore (no similarity search, just retrieve all)
-            # Use a dummy search to get all documents, or access the collection directly
+            # Get ALL documents straight from the collection - no query embedding or similarity search
             try:
-                # Get all documents by searching with empty query and high k
-                all_results = vectorstore.similarity_search("", k=100)
+                all_data = vectorstore._collection.get(include=["documents"])
                 
-                if not all_results:
-                    # Fallback: get from collection directly
-                    collection = vectorstore._collection
-                    all_data = collection.get()
-                    
-                    if all_data and 'documents' in all_data:
-                        full_content = "\n\n---\n\n".join(all_data['documents'])
-                    else:
-                        return "❌ Could not retrieve document content"
-                else:
-                    # Combine all chunks
-                    full_content = "\n\n---\n\n".join([doc.page_content for doc in all_results])
+                if not all_data or not all_data.get('documents'):
+                    return "❌ Could not retrieve document content"
+                
+                # Chunk ids are "<file_hash>_<n>" - restore the original chunk order
+                chunks = sorted(zip(all_data['ids'], all_data['documents']), key=lambda item: _chunk_index(item[0]))
+                full_content = "\n\n---\n\n".join(text for _, text in chunks)
                 
-                print(f"[VERBOSE] Retrieved complete content ({len(full_content)} characters)")
+                logger.debug("Retrieved complete content (%s characters)", len(full_content))
                 
                 # Limit output to reasonable size (100KB max)
                 max_chars = 100000
@@ -338,19 +654,55 @@ class FileTools:
                 )
                 
             except Exception as e:
-                print(f"[VERBOSE] Error retrieving full content: {e}")
+                logger.warning("Error retrieving full content: %s", e)
                 return f"❌ Error retrieving full content: {str(e)}"
                 
         except Exception as e:
             error_msg = f"❌ Error getting document content: {str(e)}"
-            print(f"[VERBOSE] {error_msg}")
+            logger.warning(error_msg)
             return error_msg
     
-    def index_document(self, file_path: str) -> str:
+    def index_documents(self, file_paths: List[str]) -> str:
+        """Index several documents, loading the next file while the current one is embedded.
+        
+        Args:
+            file_paths: Full paths to the documents
+            
+        Returns:
+            Combined success/error messages, one per document
+        """
+        load_queue = queue.Queue(maxsize=INDEX_PREFETCH_DEPTH)
+        
+        def load_worker():
+            for path in file_paths:
+                documents = None
+                try:
+                    # Skip work that index_document would reject or short-circuit anyway
+                    if os.path.isfile(path) and _index_size_class(path) == 'whole':
+                        indexed = self.document_vectorstores.get(path)
+                        if not indexed or indexed.get('fingerprint') != _file_fingerprint(path):
+                            documents = _load_document(path)
+                except Exception as e:
+                    # index_document reloads the file and reports the error
+                    logger.warning("Prefetch failed for %s: %s", path, e)
+                load_queue.put((path, documents))
+            load_queue.put(None)
+        
+        threading.Thread(target=load_worker, daemon=True).start()
+        
+        results = []
+        while (item := load_queue.get()) is not None:
+            path, documents = item
+            results.append(self.index_document(path, documents=documents))
+        
+        return "\n\n".join(results)
+    
+    def index_document(self, file_path: str, documents: Optional[List[Document]] = None) -> str:
         """Index a document for persistent querying throughout the session.
         
         Args:
             file_path: Full path to the document
+            documents: Already loaded content of the file, skips loading when given
             
         Returns:
             Success/error message
@@ -359,160 +711,107 @@ class FileTools:
             if not os.path.exists(file_path) or not os.path.isfile(file_path):
                 return f"❌ File does not exist: {file_path}"
             
-            # Check if already indexed
+            # Check if already indexed - skip only if the file is unchanged since indexing
+            fingerprint = _file_fingerprint(file_path)
             if file_path in self.document_vectorstores:
-                return f"✅ Document '{os.path.basename(file_path)}' is already indexed and ready for querying."
+                if self.document_vectorstores[file_path].get('fingerprint') == fingerprint:
+                    return f"✅ Document '{os.path.basename(file_path)}' is already indexed and ready for querying."
+                
+                logger.debug("Document changed since it was indexed - re-indexing: %s", file_path)
+                try:
+                    self._get_document_vectorstore(file_path).delete_collection()
+                except Exception as e:
+                    logger.warning("Could not drop stale collection: %s", e)
+                del self.document_vectorstores[file_path]
             
-            print(f"[VERBOSE] Indexing document: {file_path}")
+            # Refuse only files beyond the last-resort limit, before reading them into memory
+            size_class = _index_size_class(file_path)
+            if size_class == 'too_large':
+                file_size = os.path.getsize(file_path)
+                return (
+                    f"❌ File is too large to index: {os.path.basename(file_path)} "
+                    f"({file_size / (1 << 20):.1f} MB, limit {MAX_INDEX_FILE_SIZE >> 20} MB)\n"
+                    f"💡 Split the document into smaller files and index those instead."
+                )
             
-            # Load document based on type
-            documents = []
-            file_extension = file_path.lower()
+            logger.debug("Indexing document: %s", file_path)
             
-            if file_extension.endswith('.pdf'):
-                # Try to load PDF with text extraction first
-                loader = PyMuPDFLoader(file_path)
-                raw_docs = loader.load()
-                
-                # Check if PDF has extractable text or if it's image-based/scanned
-                total_text = "".join([doc.page_content for doc in raw_docs])
-                is_scanned = len(total_text.strip()) < 100  # Very little text = likely scanned
-                
-                if is_scanned:
-                    print(f"[VERBOSE] Detected scanned/image-based PDF - extracting images and using OCR")
-                    
-                    # Extract images from PDF and use OCR
-                    try:
-                        import fitz  # PyMuPDF
-                        pdf_document = fitz.open(file_path)
-                        ocr_texts = []
-                        
-                        for page_num in range(len(pdf_document)):
-                            page = pdf_document[page_num]
-                            image_list = page.get_images()
-                            
-                            if image_list:
-                                print(f"[VERBOSE] Page {page_num + 1}: Found {len(image_list)} images")
-                                
-                                for img_index, img_info in enumerate(image_list):
-                                    xref = img_info[0]
-                                    base_image = pdf_document.extract_image(xref)
-                                    image_bytes = base_image["image"]
-                                    
-                                    # Save image temporarily
-                                    import tempfile
-                                    with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as temp_img:
-                                        temp_img.write(image_bytes)
-                                        temp_img_path = temp_img.name
-                                    
-                                    # Use OCR to extract text from image
-                                    print(f"[VERBOSE] Extracting text from image {img_index + 1} on page {page_num + 1}")
-                                    ocr_text = extract_image_text(temp_img_path)
-                                    
-                                    if ocr_text and not ocr_text.startswith("Error"):
-                                        ocr_texts.append(f"[Page {page_num + 1}, Image {img_index + 1}]\n{ocr_text}")
-                                    
-                                    # Clean up temp file
-                                    try:
-                                        os.unlink(temp_img_path)
-                                    except:
-                                        pass
-                        
-                        pdf_document.close()
-                        
-                        if ocr_texts:
-                            # Create documents from OCR text
-                            combined_ocr = "\n\n---\n\n".join(ocr_texts)
-                            documents = [Document(
-                                page_content=combined_ocr,
-                                metadata={"source": file_path, "type": "scanned_pdf_with_ocr"}
-                            )]
-                            print(f"[VERBOSE] Successfully extracted text from {len(ocr_texts)} images using OCR")
-                        else:
-                            print(f"[VERBOSE] No images found or OCR failed, using original text")
-                            documents = raw_docs
-                            
-                    except Exception as ocr_error:
-                        print(f"[VERBOSE] OCR extraction failed: {ocr_error}")
-                        print(f"[VERBOSE] Falling back to original text extraction")
-                        documents = raw_docs
-                else:
-                    print(f"[VERBOSE] PDF has text content - using standard extraction")
-                    
-                    # For resumes/small PDFs, use text splitting for better chunking
-                    if len(raw_docs) <= 5:  # Small document like a resume
-                        from langchain.text_splitter import RecursiveCharacterTextSplitter
-                        text_splitter = RecursiveCharacterTextSplitter(
-                            chunk_size=800,  # Smaller chunks for better search
-                            chunk_overlap=200,  # Good overlap to maintain context
-                            length_function=len,
-                            separators=["\n\n", "\n", ". ", " ", ""]
-                        )
-                        documents = text_splitter.split_documents(raw_docs)
-                        print(f"[VERBOSE] Split PDF into {len(documents)} chunks (was {len(raw_docs)} pages)")
-                    else:
-                        # Large document, use pages as-is
-                        documents.extend(raw_docs)
-                        print(f"[VERBOSE] Using {len(documents)} pages from PDF")
-                    
-            elif file_extension.endswith('.docx'):
-                loader = Docx2txtLoader(file_path)
-                documents.extend(loader.load())
-            elif file_extension.endswith(('.xlsx', '.xls')):
-                documents.extend(read_excel_file_safely(file_path))
-            elif file_extension.endswith('.pptx'):
-                loader = UnstructuredPowerPointLoader(file_path)
-                documents.extend(loader.load())
+            # Large documents are read and embedded batch by batch; the rest are loaded whole
+            streamed = documents is None and size_class == 'stream'
+            if streamed:
+                logger.debug("Streaming large document in batches of %s chunks", STREAM_INDEX_BATCH_CHUNKS)
+                document_batches = _iter_document_batches(file_path, STREAM_INDEX_BATCH_CHUNKS)
             else:
-                # Handle text files
-                try:
-                    with open(file_path, "r", encoding="utf-8") as f:
-                        content = f.read()
-                        documents.append(Document(page_content=content, metadata={"source": file_path}))
-                except UnicodeDecodeError:
-                    # Try different encodings
-                    for encoding in ['latin-1', 'cp1252', 'iso-8859-1']:
-                        try:
-                            with open(file_path, "r", encoding=encoding) as f:
-                                content = f.read()
-                                documents.append(Document(page_content=content, metadata={"source": file_path}))
-                            break
-                        except UnicodeDecodeError:
-                            continue
-                    else:
-                        return f"❌ Unable to read file due to encoding issues: {file_path}"
-            
-            if not documents:
-                return f"❌ No content could be extracted from: {file_path}"
+                # Load document based on type
+                if documents is None:
+                    documents = _load_document(file_path)
+                
+                if not documents:
+                    return f"❌ No content could be extracted from: {file_path}"
+                document_batches = [documents]
             
             # Create persistent vectorstore for this document
-            import hashlib
-            file_hash = hashlib.md5(file_path.encode()).hexdigest()[:8]
+            # Hash the resolved path so symlinks and relative paths map to the same collection
+            file_hash = xxhash.xxh3_64(os.path.realpath(file_path).encode()).hexdigest()[:12]
             persist_path = os.path.join(self.session_persist_dir, f"doc_{file_hash}")
             
-            print(f"[VERBOSE] Creating persistent vectorstore at: {persist_path}")
+            logger.debug("Creating persistent vectorstore at: %s", persist_path)
             
-            embeddings = OpenAIEmbeddings(model="text-embedding-3-small", api_key=os.getenv("OPENAI_API_KEY"))
-            vectorstore = Chroma(
-                collection_name=f"doc_{file_hash}",
-                embedding_function=embeddings,
-                persist_directory=persist_path
-            )
-            vectorstore.add_documents(documents)
+            vectorstore = self._open_document_vectorstore(persist_path)
+            embeddings = self.document_embeddings
+            
+            # Embed each round's batches concurrently, then insert the precomputed vectors batch by batch
+            doc_count = 0
+            total_chars = 0
+            try:
+                for batch_documents in document_batches:
+                    texts = [doc.page_content for doc in batch_documents]
+                    vectors = self._embed_with_cache(embeddings, texts)
+                    
+                    for i in range(0, len(batch_documents), self.INDEX_BATCH_SIZE):
+                        end = i + self.INDEX_BATCH_SIZE
+                        vectorstore._collection.add(
+                            ids=[f"{file_hash}_{doc_count + n}" for n in range(i, min(end, len(batch_documents)))],
+                            embeddings=vectors[i:end],
+                            metadatas=[doc.metadata or {"source": file_path} for doc in batch_documents[i:end]],
+                            documents=texts[i:end]
+                        )
+                    
+                    doc_count += len(batch_documents)
+                    total_chars += sum(len(text) for text in texts)
+                
+                if doc_count == 0:
+                    vectorstore.delete_collection()
+                    return f"❌ No content could be extracted from: {file_path}"
+            except Exception:
+                # Don't leave a partially indexed collection behind
+                try:
+                    vectorstore.delete_collection()
+                except Exception as cleanup_error:
+                    logger.warning("Could not drop partial collection: %s", cleanup_error)
+                raise
             
             # Store in session
             self.document_vectorstores[file_path] = {
                 'vectorstore': vectorstore,
                 'persist_path': persist_path,
-                'doc_count': len(documents)
+                'doc_count': doc_count,
+                'total_chars': total_chars,
+                'fingerprint': fingerprint
             }
+            # Streamed documents are not held in memory; they are searched through Chroma
+            if not streamed and doc_count < self.SMALL_DOCUMENT_CHUNKS:
+                self.document_vectorstores[file_path]['vectors'] = _normalized_matrix(vectors)
+                self.document_vectorstores[file_path]['chunks'] = documents
+            self._evict_document_vectorstores()
+            self._save_document_registry()
             
-            print(f"[VERBOSE] Successfully indexed {len(documents)} document chunks")
+            logger.debug("Successfully indexed %s document chunks", doc_count)
             
             return (
                 f"✅ Successfully indexed '{os.path.basename(file_path)}'!\n\n"
                 f"📁 **Full path**: {file_path}\n"
-                f"📊 Processed: {len(documents)} document chunks\n"
+                f"📊 Processed: {doc_count} document chunks\n"
                 f"✅ Status: Ready for querying\n\n"
                 f"💡 To query this document, use:\n"
                 f"   query_document(\"{file_path}\", \"your question\")\n"
@@ -523,8 +822,7 @@ class FileTools:
             
         except Exception as e:
             error_msg = f"❌ Error indexing document: {str(e)}"
-            print(f"[VERBOSE] {error_msg}")
-            import traceback
+            logger.warning(error_msg)
             traceback.print_exc()
             return error_msg
     
@@ -551,7 +849,7 @@ class FileTools:
                 
                 if len(matched_paths) == 1:
                     file_path = matched_paths[0]
-                    print(f"[VERBOSE] Matched filename to: {file_path}")
+                    logger.debug("Matched filename to: %s", file_path)
                 elif len(matched_paths) > 1:
                     return (
                         f"❌ Multiple documents with name '{file_path}' are indexed:\n" +
@@ -562,7 +860,7 @@ class FileTools:
                     # No match found, check if there's only one indexed document
                     if len(self.document_vectorstores) == 1:
                         file_path = list(self.document_vectorstores.keys())[0]
-                        print(f"[VERBOSE] Using the only indexed document: {file_path}")
+                        logger.debug("Using the only indexed document: %s", file_path)
                     else:
                         return (
                             f"❌ Document '{file_path}' not found in indexed documents.\n"
@@ -571,40 +869,60 @@ class FileTools:
                             "\n\n💡 Please use the exact filename or full path."
                         )
             
+            # Display name, computed once the path is resolved
+            doc_name = os.path.basename(file_path)
+            
             # Check if document is indexed
             if file_path not in self.document_vectorstores:
                 return (
-                    f"❌ Document '{os.path.basename(file_path)}' is not indexed yet.\n"
+                    f"❌ Document '{doc_name}' is not indexed yet.\n"
                     f"📋 Currently indexed documents:\n" +
                     "\n".join([f"  - {os.path.basename(p)}" for p in self.document_vectorstores.keys()]) +
                     f"\n\n💡 Please use the index_document tool first to index this document."
                 )
             
-            print(f"[VERBOSE] Querying document: {file_path}")
-            print(f"[VERBOSE] Query: {query}")
+            logger.debug("Querying document: %s", file_path)
+            logger.debug("Query: %s", query)
+            
+            # Small documents (e.g. resumes) fit in context whole - skip the query embedding and search
+            total_chars = self.document_vectorstores[file_path].get('total_chars')
+            if total_chars is not None and total_chars < self.FULL_CONTENT_MAX_CHARS:
+                logger.debug("Small document (%s chars) - returning full content", total_chars)
+                return self.get_full_document_content(file_path)
             
             # Get vectorstore
-            vs_info = self.document_vectorstores[file_path]
-            vectorstore = vs_info['vectorstore']
+            vectorstore = self._get_document_vectorstore(file_path)
             
             # Smart query handling - detect counting questions
             query_lower = query.lower()
-            is_counting_query = any(word in query_lower for word in ['how many', 'count', 'total', 'number of', 'how much'])
+            is_counting_query = _COUNTING_QUERY_RE.search(query_lower) is not None
             
             # For Excel files, always fetch more context
-            file_ext = os.path.splitext(file_path)[1].lower()
-            is_excel = file_ext in ['.xlsx', '.xls', '.csv']
+            is_excel = os.path.splitext(file_path)[1].lower() in _SPREADSHEET_EXTS
             
             # Adjust search parameters based on query type
             if is_counting_query or is_excel:
                 # For counting queries or Excel files, get more results to ensure we capture summary info
                 k = 15
-                print(f"[VERBOSE] Detected {'counting query' if is_counting_query else 'Excel file'} - fetching {k} chunks")
+                logger.debug("Detected %s - fetching %s chunks", 'counting query' if is_counting_query else 'Excel file', k)
             else:
                 k = 10
             
             # Perform similarity search
-            results = vectorstore.similarity_search(query, k=k)
+            results = self._search_document(file_path, vectorstore, query, k)
+            
+            # Counting questions on spreadsheets: the workbook summary holds the row counts computed at
+            # index time - fetch it by metadata rather than hoping retrieval ranks it
+            if is_counting_query and is_excel:
+                try:
+                    summary_data = vectorstore._collection.get(
+                        where={"total_rows": {"$gte": 0}}, limit=1, include=["documents"]
+                    )
+                    summary_docs = summary_data.get('documents') or []
+                    if summary_docs and all(doc.page_content != summary_docs[0] for doc in results):
+                        results.insert(0, Document(page_content=summary_docs[0], metadata={"source": file_path}))
+                except Exception as e:
+                    logger.debug("Could not fetch workbook summary: %s", e)
             
             if not results:
                 return f"❌ No relevant content found for query: '{query}'"
@@ -616,100 +934,102 @@ class FileTools:
                     summary_found = True
                     break
             
-            # Format results intelligently
-            result_summaries = []
+            # Format results intelligently - for counting queries, summary and metadata sections go first
+            key_info = []
+            sections = []
             for i, doc in enumerate(results, 1):
                 content = doc.page_content
-                
-                # For counting queries, prioritize showing summary and metadata
-                if is_counting_query and ("SUMMARY" in content or "Rows:" in content or "Total" in content):
-                    # Show full content for summary sections
-                    result_summaries.insert(0, f"📊 KEY INFO:\n{content}")
+                if is_counting_query and _COUNT_MARKER_RE.search(content) is not None:
+                    key_info.append(content)
                 else:
-                    # Show truncated content for other sections
-                    max_len = 800 if is_excel else 1000
-                    truncated = content[:max_len] + "..." if len(content) > max_len else content
-                    result_summaries.append(f"📄 Section {i}:\n{truncated}")
+                    sections.append((i, content))
             
             # Build response with smart hints
-            response = f"📖 Query: '{query}'\n"
-            response += f"📁 Document: '{os.path.basename(file_path)}'\n"
-            response += f"🔍 Found {len(results)} relevant sections\n\n"
+            buf = io.StringIO()
+            buf.write(f"📖 Query: '{query}'\n")
+            buf.write(f"📁 Document: '{doc_name}'\n")
+            buf.write(f"🔍 Found {len(results)} relevant sections\n\n")
             
             # Add helpful context for counting queries
             if is_counting_query and is_excel:
-                response += "💡 TIP: Look for 'Total Rows', 'Rows:', or count numbers in the data below:\n\n"
+                buf.write("💡 TIP: Look for 'Total Rows', 'Rows:', or count numbers in the data below:\n\n")
+            
+            # Limit to top 10 for readability; latest key info first, as before
+            max_len = 800 if is_excel else 1000
+            shown = 0
+            for content in reversed(key_info):
+                if shown == 10:
+                    break
+                if shown:
+                    buf.write("\n\n")
+                # Show full content for summary sections
+                buf.write("📊 KEY INFO:\n")
+                buf.write(content)
+                shown += 1
+            for i, content in sections:
+                if shown == 10:
+                    break
+                if shown:
+                    buf.write("\n\n")
+                # Show truncated content for other sections
+                buf.write(f"📄 Section {i}:\n")
+                buf.write(content[:max_len])
+                if len(content) > max_len:
+                    buf.write("...")
+                shown += 1
             
-            response += "\n\n".join(result_summaries[:10])  # Limit to top 10 for readability
+            response = buf.getvalue()
             
-            print(f"[VERBOSE] Returned {len(results)} results from {file_path} (counting query: {is_counting_query})")
+            logger.debug("Returned %s results from %s (counting query: %s)", len(results), file_path, is_counting_query)
             
             return response
             
         except Exception as e:
             error_msg = f"❌ Error querying document: {str(e)}"
-            print(f"[VERBOSE] {error_msg}")
-            import traceback
+            logger.warning(error_msg)
             traceback.print_exc()
             return error_msg
     
     def cleanup_session_vectorstores(self):
         """Clean up all session-based vectorstores when session ends."""
         try:
-            print("[VERBOSE] Cleaning up session vectorstores...")
-            
-            # Close all vectorstores
-            for file_path, vs_info in self.document_vectorstores.items():
-                try:
-                    vectorstore = vs_info.get('vectorstore')
-                    if vectorstore:
-                        # Try to properly close the vectorstore
-                        try:
-                            if hasattr(vectorstore, '_client'):
-                                vectorstore._client = None
-                            if hasattr(vectorstore, '_collection'):
-                                vectorstore._collection = None
-                        except:
-                            pass
-                        del vs_info['vectorstore']
-                except Exception as e:
-                    print(f"[VERBOSE] Error closing vectorstore for {file_path}: {e}")
+            logger.debug("Cleaning up session vectorstores...")
             
+            # Drop all vectorstore handles; their systems are stopped below
             self.document_vectorstores.clear()
             
-            # Force garbage collection multiple times
-            import gc
-            gc.collect()
-            gc.collect()
+            # Close the embedding cache so its files can be removed
+            with self._embedding_cache_lock:
+                if self._embedding_cache is not None:
+                    self._embedding_cache.close()
+                    self._embedding_cache = None
             
-            # Wait longer for file handles to release on Windows
-            import time
-            time.sleep(2)
+            # Stop every cached system under the session directory - including those of evicted
+            # and registry-restored stores - which closes their SQLite handles and joins their threads
+            _release_chroma_systems(self.session_persist_dir)
             
-            # Delete the session directory with retry logic
+            # Handles are closed explicitly above, so the directory can be removed right away
             if os.path.exists(self.session_persist_dir):
-                max_retries = 3
-                for attempt in range(max_retries):
+                _fast_rmtree(self.session_persist_dir)
+                if os.path.exists(self.session_persist_dir):
+                    # Something still holds a file open - move the leftovers aside and let Windows delete them later
+                    leftover_dir = f"{self.session_persist_dir}.del_{uuid.uuid4().hex}"
                     try:
-                        import shutil
-                        shutil.rmtree(self.session_persist_dir, ignore_errors=True)
-                        print(f"[VERBOSE] ✅ Cleaned up session vectorstores")
-                        break
-                    except PermissionError as e:
-                        if attempt < max_retries - 1:
-                            print(f"[VERBOSE] Retry {attempt + 1}/{max_retries} - waiting for file handles...")
-                            time.sleep(1)
-                            gc.collect()
+                        os.rename(self.session_persist_dir, leftover_dir)
+                    except OSError as e:
+                        logger.warning("⚠️ Could not fully delete session directory: %s", e)
+                    else:
+                        if _delete_on_reboot(leftover_dir):
+                            logger.debug("Moved locked session files to %s for deletion at reboot", leftover_dir)
                         else:
-                            print(f"[VERBOSE] ⚠️ Could not delete session directory after {max_retries} attempts: {e}")
-                    except Exception as e:
-                        print(f"[VERBOSE] ⚠️ Could not delete session directory: {e}")
-                        break
+                            logger.debug("Moved locked session files to %s; they are removed on the next start", leftover_dir)
+                else:
+                    logger.debug("✅ Cleaned up session vectorstores")
             
         except Exception as e:
             # Silently handle cleanup errors - don't show scary error messages
             if "WinError 6" not in str(e):  # Only log non-handle errors
-                print(f"[VERBOSE] Cleanup completed with minor issues: {e}")
+                logger.debug("Cleanup completed with minor issues: %s", e)
     
     def __del__(self):
         """Cleanup when FileTools instance is destroyed."""
@@ -721,101 +1041,446 @@ class FileTools:
                 pass  # Ignore Windows handle errors during destruction
 
 
+def _fast_rmtree(root: str):
+    """Delete a directory tree, unlinking its files concurrently; errors are ignored like rmtree(ignore_errors=True)."""
+    file_paths = [os.path.join(dir_path, name) for dir_path, _, names in os.walk(root) for name in names]
+    
+    def unlink(path):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+    
+    # unlink is a plain syscall that releases the GIL, so threads overlap the filesystem latency
+    with ThreadPoolExecutor(max_workers=RMTREE_MAX_WORKERS) as executor:
+        list(executor.map(unlink, file_paths))
+    
+    for dir_path, _, _ in os.walk(root, topdown=False):
+        try:
+            os.rmdir(dir_path)
+        except OSError:
+            pass
+
+
+def _index_size_class(file_path: str) -> str:
+    """How a document is indexed by size: 'whole', 'stream' (in batches) or 'too_large'."""
+    if os.path.splitext(file_path)[1].lower() not in _SIZE_LIMITED_EXTS:
+        return 'whole'
+    file_size = os.path.getsize(file_path)
+    if file_size > MAX_INDEX_FILE_SIZE:
+        return 'too_large'
+    if file_size > STREAM_INDEX_FILE_SIZE:
+        return 'stream'
+    return 'whole'
+
+
+def _release_chroma_systems(path: str):
+    """Stop and forget Chroma's cached systems for persist directories at or under path.
+    
+    Chroma keeps one System per persist directory and hands it back on reopen, so dropping
+    a vectorstore alone leaves its SQLite and HNSW files open.
+    """
+    try:
+        from chromadb.api.client import SharedSystemClient
+    except ImportError:
+        return
+    
+    root = os.path.abspath(path)
+    for identifier in list(SharedSystemClient._identifier_to_system):
+        if not identifier:
+            continue
+        identifier_path = os.path.abspath(identifier)
+        if identifier_path == root or identifier_path.startswith(root + os.sep):
+            system = SharedSystemClient._identifier_to_system.pop(identifier, None)
+            try:
+                if system is not None:
+                    system.stop()
+            except Exception as e:
+                logger.debug("Could not stop Chroma system for %s: %s", identifier, e)
+
+
+def _delete_on_reboot(path: str) -> bool:
+    """Schedule a directory tree for deletion at the next Windows reboot.
+    
+    Returns whether every entry was scheduled; always False outside Windows. Scheduling
+    needs administrator rights, so it commonly fails for a normal user.
+    """
+    if os.name != 'nt':
+        return False
+    
+    MOVEFILE_DELAY_UNTIL_REBOOT = 0x4
+    move_file = ctypes.WinDLL('kernel32', use_last_error=True).MoveFileExW
+    
+    # Pending deletes run in order, so files go before the directories containing them
+    for root, dirs, files in os.walk(path, topdown=False):
+        for entry in [os.path.join(root, name) for name in files] + [root]:
+            if not move_file(entry, None, MOVEFILE_DELAY_UNTIL_REBOOT):
+                logger.warning("Could not schedule %s for deletion at reboot: %s", entry, ctypes.WinError(ctypes.get_last_error()))
+                return False
+    return True
+
+
+def _embed_texts_concurrently(embeddings, texts: List[str], batch_size: int) -> List[List[float]]:
+    """Embed texts with one embedding request per batch, several in flight, preserving order."""
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    
+    async def embed_all():
+        # Bound in-flight embedding requests to stay within rate limits
+        semaphore = asyncio.Semaphore(EMBED_MAX_CONCURRENCY)
+        
+        async def embed(batch):
+            async with semaphore:
+                return await embeddings.aembed_documents(batch)
+        
+        results = await asyncio.gather(*(embed(batch) for batch in batches))
+        return [vector for batch_vectors in results for vector in batch_vectors]
+    
+    return _run_async(embed_all())
+
+
+def _run_async(coro):
+    """Run a coroutine on the shared background event loop and wait for its result.
+    
+    A single long-lived loop lets shared async HTTP clients keep their connections, and works
+    whether or not the caller is itself inside an event loop (e.g. the API server).
+    """
+    global _ASYNC_LOOP
+    with _ASYNC_LOOP_LOCK:
+        if _ASYNC_LOOP is None:
+            _ASYNC_LOOP = asyncio.new_event_loop()
+            threading.Thread(target=_ASYNC_LOOP.run_forever, name="file-tools-async", daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(coro, _ASYNC_LOOP).result()
+
+
+def _normalized_matrix(vectors) -> np.ndarray:
+    """Stack embedding vectors into a float32 matrix with unit-length rows."""
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _intern_metadata(metadata) -> dict:
+    """Copy chunk metadata with interned keys and string values.
+    
+    Chroma returns fresh strings for every chunk; interning keeps one copy of repeated keys, paths and sheet names.
+    """
+    return {
+        sys.intern(key): sys.intern(value) if isinstance(value, str) else value
+        for key, value in (metadata or {}).items()
+    }
+
+
+def _chunk_index(chunk_id: str) -> int:
+    """Position of a chunk within its document, from ids of the form "<file_hash>_<n>"."""
+    suffix = chunk_id.rsplit('_', 1)[-1]
+    return int(suffix) if suffix.isdigit() else 0
+
+
+def _file_fingerprint(file_path: str) -> str:
+    """Cheap change marker for a file based on its modification time and size."""
+    stat = os.stat(file_path)
+    return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def _excel_documents(file_path: str, sheets, engine: str) -> List[Document]:
+    """Build a workbook summary Document plus one Document per window of each sheet's rows.
+    
+    Args:
+        file_path: Path of the workbook
+        sheets: (sheet_name, column_names, row_lines, row_count) per sheet; row lines are tab-separated and
+            newline-terminated, and may stop short of row_count when the sheet exceeds the cell cap
+        engine: Reader that produced the rows, recorded in the metadata
+        
+    Returns:
+        Summary Document followed by sheet chunks of at most EXCEL_CHUNK_CHARS of row data
+    """
+    total_rows = sum(row_count for _, _, _, row_count in sheets)
+    
+    # File summary with per-sheet counts - counting queries look for this section
+    summary = f"📊 EXCEL FILE SUMMARY: {os.path.basename(file_path)}\n"
+    summary += f"Total Sheets: {len(sheets)}\n"
+    summary += f"Total Data Rows (all sheets): {total_rows}\n\n"
+    summary += "\n".join(
+        f"📋 SHEET: {sheet_name} | Rows: {row_count} | Columns: {len(columns)}"
+        for sheet_name, columns, _, row_count in sheets
+    )
+    documents = [Document(
+        page_content=summary,
+        metadata={
+            "source": file_path,
+            "type": "excel",
+            "total_sheets": len(sheets),
+            "total_rows": total_rows,
+            "engine": engine
+        }
+    )]
+    
+    for sheet_name, columns, rows, row_count in sheets:
+        # One shared string per sheet for all its chunks' metadata
+        sheet_label = sys.intern(str(sheet_name))
+        
+        # Every chunk repeats the sheet header so it reads on its own in search results
+        header = f"{'='*60}\n"
+        header += f"📋 SHEET: {sheet_name}\n"
+        header += f"Rows: {row_count} | Columns: {len(columns)}\n"
+        header += f"{'='*60}\n\n"
+        header += f"COLUMNS: {', '.join(str(col) for col in columns)}\n\n"
+        
+        if not rows:
+            documents.append(Document(
+                page_content=header + "(No data in this sheet)\n",
+                metadata={"source": file_path, "type": "excel", "sheet": sheet_label, "engine": engine}
+            ))
+            continue
+        
+        # Whole rows per chunk, up to EXCEL_CHUNK_CHARS of data
+        start = 0
+        while start < len(rows):
+            end, size = start, 0
+            while end < len(rows) and (end == start or size + len(rows[end]) <= EXCEL_CHUNK_CHARS):
+                size += len(rows[end])
+                end += 1
+            
+            content = header + f"DATA (rows {start}-{end - 1} of {row_count}):\n" + "".join(rows[start:end])
+            if end == len(rows) and row_count > len(rows):
+                content += f"... ({row_count - len(rows)} more rows not shown)\n"
+            
+            documents.append(Document(
+                page_content=content,
+                metadata={
+                    "source": file_path,
+                    "type": "excel",
+                    "sheet": sheet_label,
+                    "row_start": start,
+                    "row_end": end - 1,
+                    "engine": engine
+                }
+            ))
+            start = end
+    
+    return documents
+
+
+def _read_excel_polars(file_path: str) -> List[Document]:
+    """Read every sheet with polars' calamine engine."""
+    df_dict = pl.read_excel(file_path, sheet_id=0, engine='calamine')  # Read all sheets
+    
+    sheets = []
+    for sheet_name, sheet_df in df_dict.items():
+        # Remove completely empty rows
+        if sheet_df.width:
+            sheet_df = sheet_df.filter(~pl.all_horizontal(pl.all().is_null()))
+        
+        # Apply the cell cap before formatting anything
+        shown_df = sheet_df.head(_excel_row_limit(sheet_df.width))
+        rows = shown_df.with_row_index().write_csv(separator='\t', include_header=False).splitlines(keepends=True)
+        sheets.append((sheet_name, sheet_df.columns, rows, sheet_df.height))
+    
+    documents = _excel_documents(file_path, sheets, "calamine")
+    logger.debug("Read Excel file with polars calamine engine (%s chunks)", len(documents))
+    return documents
+
+
+def _read_excel_calamine(file_path: str) -> List[Document]:
+    """Read every sheet as lists of cell values with python-calamine."""
+    workbook = CalamineWorkbook.from_path(file_path)
+    
+    sheets = []
+    for sheet_name in workbook.sheet_names:
+        values = workbook.get_sheet_by_name(sheet_name).to_python()
+        header = values[0] if values else []
+        columns = [str(col) if col != "" else f"Unnamed: {i}" for i, col in enumerate(header)]
+        
+        row_lines = []
+        row_count = 0
+        row_limit = _excel_row_limit(len(columns))
+        for row in values[1:]:
+            # Skip completely empty rows - calamine returns "" for empty cells
+            if all(value == "" for value in row):
+                continue
+            if row_count < row_limit:
+                row_lines.append(f"{row_count}\t" + "\t".join(str(value) for value in row) + "\n")
+            row_count += 1
+        
+        sheets.append((sheet_name, columns, row_lines, row_count))
+    
+    documents = _excel_documents(file_path, sheets, "python-calamine")
+    logger.debug("Read Excel file with python-calamine (%s chunks)", len(documents))
+    return documents
+
+
+def _stream_xlsx(file_path: str) -> List[Document]:
+    """Read an .xlsx workbook row by row in openpyxl read-only mode, without building DataFrames."""
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        sheets = []
+        for worksheet in workbook.worksheets:
+            rows = worksheet.iter_rows(values_only=True)
+            header = next(rows, ())
+            columns = [str(col) if col is not None else f"Unnamed: {i}" for i, col in enumerate(header)]
+            
+            row_lines = []
+            row_count = 0
+            row_limit = _excel_row_limit(len(columns))
+            for row in rows:
+                # Skip completely empty rows
+                if all(value is None for value in row):
+                    continue
+                # Rows past the cell cap are only counted, not formatted
+                if row_count < row_limit:
+                    values = "\t".join("" if value is None else str(value) for value in row)
+                    row_lines.append(f"{row_count}\t{values}\n")
+                row_count += 1
+            
+            sheets.append((worksheet.title, columns, row_lines, row_count))
+    finally:
+        workbook.close()
+    
+    documents = _excel_documents(file_path, sheets, "openpyxl-read-only")
+    logger.debug("Streamed Excel file with openpyxl read-only mode (%s chunks)", len(documents))
+    return documents
+
+
+def _excel_row_limit(column_count: int) -> int:
+    """Rows of a sheet that fit in the EXCEL_MAX_CELLS_PER_SHEET budget."""
+    return max(1, EXCEL_MAX_CELLS_PER_SHEET // max(column_count, 1))
+
+
+def _excel_sheet_rows(sheet_name, sheet_df):
+    """Turn a pandas sheet into (sheet_name, column_names, row_lines, row_count) for _excel_documents."""
+    # Remove completely empty rows
+    sheet_df = sheet_df.dropna(how='all')
+    row_count = len(sheet_df)
+    
+    # Apply the cell cap before formatting anything
+    sheet_df = sheet_df.head(_excel_row_limit(len(sheet_df.columns)))
+    
+    # Tab-separated rows with row numbers for counting - to_string's column padding pass is far slower
+    data = None
+    if PYARROW_AVAILABLE:
+        try:
+            # Arrow formats all cells in native code; mixed-type object columns make it raise
+            table = pa.Table.from_pandas(sheet_df.reset_index(), preserve_index=False)
+            buf = io.BytesIO()
+            pa_csv.write_csv(table, buf, write_options=pa_csv.WriteOptions(include_header=False, delimiter='\t'))
+            data = buf.getvalue().decode('utf-8')
+        except Exception as e:
+            logger.debug("Arrow CSV write failed for sheet %s, using pandas: %s", sheet_name, e)
+    if data is None:
+        data = sheet_df.to_csv(sep='\t', index=True, header=False, lineterminator='\n')
+    
+    return sheet_name, [str(col) for col in sheet_df.columns], data.splitlines(keepends=True), row_count
+
+
 def read_excel_file_safely(file_path: str) -> List[Document]:
-    """Safely read Excel file with multiple fallback methods and preserve structure for better querying."""
+    """Safely read Excel file, reusing the parsed content while the file is unchanged."""
+    try:
+        key = (file_path, _file_fingerprint(file_path))
+    except OSError:
+        return _read_excel_file(file_path)
+    
+    with _EXCEL_CACHE_LOCK:
+        cached = _EXCEL_CACHE.get(key)
+        if cached is not None:
+            _EXCEL_CACHE.move_to_end(key)
+    
+    if cached is None:
+        documents = _read_excel_file(file_path)
+        cached = tuple((doc.page_content, dict(doc.metadata)) for doc in documents)
+        
+        # Failed reads (e.g. file locked by Excel) are retried next time rather than cached
+        if not any(metadata.get("type") in ("error", "critical_error") for _, metadata in cached):
+            with _EXCEL_CACHE_LOCK:
+                # Drop content parsed from older versions of the same file
+                for stale_key in [k for k in _EXCEL_CACHE if k[0] == file_path]:
+                    del _EXCEL_CACHE[stale_key]
+                _EXCEL_CACHE[key] = cached
+                while len(_EXCEL_CACHE) > EXCEL_CACHE_SIZE:
+                    _EXCEL_CACHE.popitem(last=False)
+        return documents
+    
+    # Fresh Document objects so callers can't modify the cached metadata
+    return [Document(page_content=content, metadata=dict(metadata)) for content, metadata in cached]
+
+
+def _read_excel_file(file_path: str) -> List[Document]:
+    """Read Excel file with multiple fallback methods and preserve structure for better querying."""
     documents = []
     
     try:
+        # Method 0: polars + calamine (Rust parser) when installed
+        if POLARS_AVAILABLE:
+            try:
+                return _read_excel_polars(file_path)
+            except Exception as e:
+                logger.warning("calamine read failed, falling back: %s", e)
+        
+        # Fast path: stream .xlsx sheets without building DataFrames - memory stays flat per row
+        if EXCEL_DEPS_AVAILABLE and file_path.lower().endswith('.xlsx'):
+            try:
+                return _stream_xlsx(file_path)
+            except Exception as e:
+                logger.warning("Streaming read failed, falling back to pandas: %s", e)
+        
         # Method 1: Try pandas with different engines - IMPROVED for better structure
         if EXCEL_DEPS_AVAILABLE:
-            print(f"[VERBOSE] Trying to read Excel file with pandas: {file_path}")
+            logger.debug("Trying to read Excel file with pandas: %s", file_path)
             
             # Try different engines in order of preference
             engines = ['openpyxl', 'xlrd', None]
             
             for engine in engines:
                 try:
-                    if engine:
-                        df_dict = pd.read_excel(file_path, engine=engine, sheet_name=None)  # Read all sheets
-                    else:
-                        df_dict = pd.read_excel(file_path, sheet_name=None)  # Let pandas choose engine
+                    # Open the workbook once and parse every sheet from it; engine=None lets pandas choose
+                    with pd.ExcelFile(file_path, engine=engine) as excel_file:
+                        # Convert all sheets to row-windowed chunks with ENHANCED METADATA
+                        sheets = [
+                            _excel_sheet_rows(sheet_name, excel_file.parse(sheet_name))
+                            for sheet_name in excel_file.sheet_names
+                        ]
                     
-                    # Convert all sheets to text with ENHANCED METADATA
-                    all_content = []
+                    documents = _excel_documents(file_path, sheets, engine or "default")
                     
-                    # Add file summary at the top
-                    summary = f"📊 EXCEL FILE SUMMARY: {os.path.basename(file_path)}\n"
-                    summary += f"Total Sheets: {len(df_dict)}\n"
-                    total_rows = sum(len(df) for df in df_dict.values())
-                    summary += f"Total Data Rows (all sheets): {total_rows}\n\n"
-                    all_content.append(summary)
-                    
-                    for sheet_name, sheet_df in df_dict.items():
-                        # Remove completely empty rows
-                        sheet_df = sheet_df.dropna(how='all')
-                        
-                        # Sheet header with metadata
-                        sheet_content = f"{'='*60}\n"
-                        sheet_content += f"📋 SHEET: {sheet_name}\n"
-                        sheet_content += f"Rows: {len(sheet_df)} | Columns: {len(sheet_df.columns)}\n"
-                        sheet_content += f"{'='*60}\n\n"
-                        
-                        # Column names
-                        sheet_content += f"COLUMNS: {', '.join(str(col) for col in sheet_df.columns)}\n\n"
-                        
-                        # Data with row numbers for counting
-                        if len(sheet_df) > 0:
-                            sheet_content += f"DATA (showing all {len(sheet_df)} rows):\n"
-                            # Convert to string with better formatting
-                            sheet_content += sheet_df.to_string(index=True, max_rows=None)
-                        else:
-                            sheet_content += "(No data in this sheet)\n"
-                        
-                        all_content.append(sheet_content)
-                    
-                    combined_content = "\n\n".join(all_content)
-                    documents.append(Document(
-                        page_content=combined_content,
-                        metadata={
-                            "source": file_path, 
-                            "type": "excel",
-                            "total_sheets": len(df_dict),
-                            "total_rows": total_rows,
-                            "engine": engine or "default"
-                        }
-                    ))
-                    
-                    print(f"[VERBOSE] Successfully read Excel file with engine: {engine} ({total_rows} total rows)")
+                    logger.debug("Successfully read Excel file with engine: %s (%s chunks)", engine, len(documents))
                     return documents
                     
                 except Exception as e:
-                    print(f"[VERBOSE] Failed with engine {engine}: {str(e)}")
+                    logger.warning("Failed with engine %s: %s", engine, e)
                     continue
         
-        # Method 2: Try UnstructuredExcelLoader as fallback
-        print(f"[VERBOSE] Trying UnstructuredExcelLoader for: {file_path}")
+        # Method 2: python-calamine reads xlsx/xls/xlsb directly in Rust
+        if CALAMINE_AVAILABLE:
+            logger.debug("Trying python-calamine for: %s", file_path)
+            try:
+                return _read_excel_calamine(file_path)
+            except Exception as e:
+                logger.warning("python-calamine failed: %s", e)
+        
+        # Then UnstructuredExcelLoader as the slowest fallback
+        logger.debug("Trying UnstructuredExcelLoader for: %s", file_path)
         try:
             loader = UnstructuredExcelLoader(file_path)
             documents.extend(loader.load())
-            print(f"[VERBOSE] Successfully read Excel file with UnstructuredExcelLoader")
+            logger.debug("Successfully read Excel file with UnstructuredExcelLoader")
             return documents
         except Exception as e:
-            print(f"[VERBOSE] UnstructuredExcelLoader failed: {str(e)}")
+            logger.warning("UnstructuredExcelLoader failed: %s", e)
         
         # Method 3: Try to read as CSV if it's a simple format
-        print(f"[VERBOSE] Trying to read as CSV: {file_path}")
+        logger.debug("Trying to read as CSV: %s", file_path)
         try:
             if EXCEL_DEPS_AVAILABLE:
                 df = pd.read_csv(file_path)
-                content = df.to_string(index=False)
+                content = df.to_csv(sep='\t', index=False, lineterminator='\n')
                 documents.append(Document(
                     page_content=content,
                     metadata={"source": file_path, "type": "csv_fallback"}
                 ))
-                print(f"[VERBOSE] Successfully read as CSV")
+                logger.debug("Successfully read as CSV")
                 return documents
         except Exception as e:
-            print(f"[VERBOSE] CSV fallback failed: {str(e)}")
+            logger.warning("CSV fallback failed: %s", e)
         
         # Method 4: Last resort - inform user about the limitation
         error_msg = (
@@ -840,7 +1505,7 @@ def read_excel_file_safely(file_path: str) -> List[Document]:
         
     except Exception as e:
         error_msg = f"Critical error reading Excel file: {str(e)}"
-        print(f"[VERBOSE] {error_msg}")
+        logger.warning(error_msg)
         documents.append(Document(
             page_content=error_msg,
             metadata={"source": file_path, "type": "critical_error"}
@@ -848,6 +1513,197 @@ def read_excel_file_safely(file_path: str) -> List[Document]:
         return documents
 
 
+async def _ocr_pdf_images(tasks) -> List[Optional[str]]:
+    """OCR images extracted from PDF pages concurrently, in task order; None where nothing usable came back."""
+    llm = ChatOpenAI(model="gpt-4o-mini", max_tokens=1024)
+    
+    # Bound in-flight vision requests to stay within rate limits
+    semaphore = asyncio.Semaphore(OCR_MAX_WORKERS)
+    
+    async def ocr(task):
+        page_num, img_index, image_bytes = task
+        
+        async with semaphore:
+            # Use OCR to extract text from image - decoded straight from memory, no temp file
+            logger.debug("Extracting text from image %s on page %s", img_index + 1, page_num + 1)
+            try:
+                encoding = await asyncio.to_thread(_encode_image_for_ocr, io.BytesIO(image_bytes))
+                response = await llm.ainvoke([_ocr_message(encoding)])
+                ocr_text = response.content
+            except Exception as e:
+                logger.warning("Error extracting text from image %s on page %s: %s", img_index + 1, page_num + 1, e)
+                return None
+        
+        if ocr_text:
+            return f"[Page {page_num + 1}, Image {img_index + 1}]\n{ocr_text}"
+        return None
+    
+    return await asyncio.gather(*(ocr(task) for task in tasks))
+
+
+# PDF splitters are stateless, so they are built once instead of per document
+# Small documents like resumes get smaller chunks with more overlap for better search
+_SMALL_PDF_SPLITTER = RecursiveCharacterTextSplitter(
+    chunk_size=800,
+    chunk_overlap=200,
+    length_function=len,
+    separators=["\n\n", "\n", ". ", " ", ""]
+)
+_PDF_SPLITTER = RecursiveCharacterTextSplitter(
+    chunk_size=1000,
+    chunk_overlap=100,
+    length_function=len,
+    separators=["\n\n", "\n", ". ", " ", ""]
+)
+
+
+def _load_pdf(file_path: str) -> List[Document]:
+    """Load a PDF, falling back to OCR of embedded images for scanned documents."""
+    documents = []
+    ocr_tasks = []
+    
+    # Single PyMuPDF pass: pages are chunked as they are read, images are collected if the PDF is scanned
+    with fitz.open(file_path) as pdf_document:
+        page_count = len(pdf_document)
+        
+        # For resumes/small PDFs, use smaller chunks for better search
+        text_splitter = _SMALL_PDF_SPLITTER if page_count <= 5 else _PDF_SPLITTER
+        
+        text_chars = 0
+        for page_num, page in enumerate(pdf_document):
+            page_text = page.get_text("text")
+            text_chars += len(page_text.strip())
+            documents.extend(
+                Document(page_content=chunk, metadata={"source": file_path, "page": page_num + 1})
+                for chunk in text_splitter.split_text(page_text)
+            )
+        
+        # Check if PDF has extractable text or if it's image-based/scanned
+        is_scanned = text_chars < 100  # Very little text = likely scanned
+        
+        if is_scanned:
+            logger.debug("Detected scanned/image-based PDF - extracting images and using OCR")
+            try:
+                for page_num, page in enumerate(pdf_document):
+                    image_list = page.get_images()
+                    
+                    if image_list:
+                        logger.debug("Page %s: Found %s images", page_num + 1, len(image_list))
+                        
+                        for img_index, img_info in enumerate(image_list):
+                            xref = img_info[0]
+                            image_bytes = pdf_document.extract_image(xref)["image"]
+                            ocr_tasks.append((page_num, img_index, image_bytes))
+            except Exception as image_error:
+                logger.warning("Image extraction failed: %s", image_error)
+                ocr_tasks = []
+    
+    if not is_scanned:
+        logger.debug("PDF has text content - split into %s chunks (%s pages)", len(documents), page_count)
+        return documents
+    
+    # OCR the collected images concurrently
+    try:
+        ocr_results = _run_async(_ocr_pdf_images(ocr_tasks))
+        
+        # gather keeps task order, i.e. page then image order
+        ocr_texts = [text for text in ocr_results if text]
+        
+        if ocr_texts:
+            # Create documents from OCR text
+            combined_ocr = "\n\n---\n\n".join(ocr_texts)
+            documents = [Document(
+                page_content=combined_ocr,
+                metadata={"source": file_path, "type": "scanned_pdf_with_ocr"}
+            )]
+            logger.debug("Successfully extracted text from %s images using OCR", len(ocr_texts))
+        else:
+            logger.warning("No images found or OCR failed, using original text")
+    
+    except Exception as ocr_error:
+        logger.warning("OCR extraction failed: %s", ocr_error)
+        logger.debug("Falling back to original text extraction")
+    
+    return documents
+
+
+def _load_docx(file_path: str) -> List[Document]:
+    """Load a Word document."""
+    return Docx2txtLoader(file_path).load()
+
+
+def _load_pptx(file_path: str) -> List[Document]:
+    """Load a PowerPoint presentation."""
+    return UnstructuredPowerPointLoader(file_path).load()
+
+
+def _load_text(file_path: str) -> List[Document]:
+    """Load a plain text file, trying common encodings."""
+    for encoding in ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']:
+        try:
+            with open(file_path, "r", encoding=encoding) as f:
+                content = f.read()
+            return [Document(page_content=content, metadata={"source": file_path})]
+        except UnicodeDecodeError:
+            continue
+    raise ValueError(f"Unable to read file due to encoding issues: {file_path}")
+
+
+# Document loaders keyed by lowercase file extension; anything else is read as text
+_DOCUMENT_LOADERS = {
+    '.pdf': _load_pdf,
+    '.docx': _load_docx,
+    '.xlsx': read_excel_file_safely,
+    '.xls': read_excel_file_safely,
+    '.xlsb': read_excel_file_safely,
+    '.pptx': _load_pptx,
+}
+
+
+def _load_document(file_path: str) -> List[Document]:
+    """Load a file with the loader registered for its extension."""
+    file_extension = os.path.splitext(file_path)[1].lower()
+    loader = _DOCUMENT_LOADERS.get(file_extension, _load_text)
+    return loader(file_path)
+
+
+def _iter_document_chunks(file_path: str):
+    """Yield the chunks of a large document a page or text block at a time.
+    
+    Scanned PDFs are not OCR-ed here; pages without a text layer yield nothing.
+    """
+    file_extension = os.path.splitext(file_path)[1].lower()
+    
+    if file_extension == '.pdf':
+        with fitz.open(file_path) as pdf_document:
+            for page_num, page in enumerate(pdf_document):
+                for chunk in _PDF_SPLITTER.split_text(page.get_text("text")):
+                    yield Document(page_content=chunk, metadata={"source": file_path, "page": page_num + 1})
+    elif file_extension == '.docx':
+        # docx2txt extracts the whole text at once; only the embedding is batched
+        for document in _load_docx(file_path):
+            for chunk in _PDF_SPLITTER.split_text(document.page_content):
+                yield Document(page_content=chunk, metadata={"source": file_path})
+    else:
+        # Blocks end on a line break, so lines are never cut in half
+        with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+            while lines := f.readlines(TEXT_STREAM_BLOCK_CHARS):
+                for chunk in _PDF_SPLITTER.split_text("".join(lines)):
+                    yield Document(page_content=chunk, metadata={"source": file_path})
+
+
+def _iter_document_batches(file_path: str, batch_chunks: int):
+    """Group the chunks of _iter_document_chunks into lists of at most batch_chunks."""
+    batch = []
+    for document in _iter_document_chunks(file_path):
+        batch.append(document)
+        if len(batch) >= batch_chunks:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
 @tool
 def open_file_tool(file_path: str) -> str:
     """Open a file using the default system application by giving full path.Full path is must to open.
@@ -859,20 +1715,20 @@ def open_file_tool(file_path: str) -> str:
     """
     try:
         # Add verbose logging
-        print(f"[VERBOSE] Attempting to open file: {file_path}")
+        logger.debug("Attempting to open file: %s", file_path)
         
         if not os.path.exists(file_path):
             error_msg = f"File does not exist: {file_path}"
-            print(f"[VERBOSE] {error_msg}")
+            logger.warning(error_msg)
             return error_msg
         
         os.startfile(file_path)
         success_msg = f'The file "{os.path.basename(file_path)}" has been successfully opened. If you need any further assistance, feel free to ask!'
-        print(f"[VERBOSE] {success_msg}")
+        logger.debug(success_msg)
         return success_msg
     except Exception as e:
         error_msg = f"Error opening file {file_path}: {str(e)}"
-        print(f"[VERBOSE] {error_msg}")
+        logger.warning(error_msg)
         return error_msg
 
 # DEPRECATED: This function is replaced by index_document and query_document
@@ -959,6 +1815,52 @@ def create_vector_store_and_query(file_path: str, query: str) -> str:
 #     print(search_results)
 #     return search_results
 
+def _encode_image_for_ocr(image_source) -> str:
+    """Load an image (path or file-like object), shrink it to the OCR size budget and return it as base64 JPEG."""
+    with Image.open(image_source) as img:
+        if max(img.size) > OCR_MAX_IMAGE_SIDE:
+            img.thumbnail((OCR_MAX_IMAGE_SIDE, OCR_MAX_IMAGE_SIDE), Image.LANCZOS)
+        
+        # JPEG has no alpha channel / palette support
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG", quality=OCR_JPEG_QUALITY)
+    
+    return _b64encode_str(buf.getbuffer())
+
+
+def _ocr_message(encoding: str) -> HumanMessage:
+    """Build the OCR request for the vision model from a base64 JPEG image."""
+    return HumanMessage(
+        content=[
+            {
+                "type": "text",
+                "text": "Extract all the text from this image and list it clearly."
+            },
+            {
+                "type": "image_url",
+                "image_url": {"url": f"data:image/jpeg;base64,{encoding}"},
+            },
+        ]
+    )
+
+
+def _ocr_image(image_source) -> str:
+    """Send an image (path or file-like object) to the vision model and return the extracted text."""
+    # Downscale and re-encode as JPEG before upload - avoids sending multi-MB originals
+    encoding = _encode_image_for_ocr(image_source)
+
+    # Initialize the OpenAI multimodal model
+    llm = ChatOpenAI(model="gpt-4o-mini", max_tokens=1024)
+
+    # Invoke the model
+    response = llm.invoke([_ocr_message(encoding)])
+
+    return response.content
+
+
 @tool
 def extract_image_text(image_path: str) -> str:
     """Extract text from an image file using OCR."""
@@ -966,38 +1868,10 @@ def extract_image_text(image_path: str) -> str:
         if not os.path.exists(image_path) or not os.path.isfile(image_path):
             return f"File does not exist: {image_path}"
         
-        # Finding image extension
-        image_filename, image_extension = os.path.splitext(image_path)
-        image_extension = image_extension.lower().replace('.', '')
-
-        # Adding images encoding as tool
-        with open(image_path, "rb") as image_file:
-            encoding = base64.b64encode(image_file.read()).decode('utf-8')
-
-        # Initialize the OpenAI multimodal model
-        llm = ChatOpenAI(model="gpt-4o-mini", max_tokens=1024)
-
-        # Create the message payload for the chat model
-        message = HumanMessage(
-            content=[
-                {
-                    "type": "text",
-                    "text": "Extract all the text from this image and list it clearly."
-                },
-                {
-                    "type": "image_url",
-                    "image_url": {"url": f"data:image/{image_extension};base64,{encoding}"},
-                },
-            ]
-        )
-
-        # Invoke the model
-        response = llm.invoke([message])
-
-        return response.content
+        return _ocr_image(image_path)
     except Exception as e:
         error_msg = f"Error extracting text from image {image_path}: {str(e)}"
-        print(f"[VERBOSE] {error_msg}")
+        logger.warning(error_msg)
         return error_msg
 
 
@@ -1,401 +1,580 @@
 """
 Streamlit UI components for the AI agents project with modern WhatsApp-like interface.
 """
+import html
+import re
+import uuid
 import streamlit as st
 from typing import List, Dict, Any
 from datetime import datetime
+from functools import lru_cache
+
+
+def _minify_css(css: str) -> str:
+    """Strip comments and redundant whitespace from a stylesheet."""
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};,>])\s*", r"\1", css)
+    # Only the space after ":" goes; a space before it may be a descendant combinator
+    css = re.sub(r":\s+", ":", css)
+    return css.replace(";}", "}").strip()
+
+
+# Static stylesheet, minified once at import and re-emitted on every rerun
+# (Streamlit drops elements that a rerun does not emit again).
+_RAW_CHAT_CSS = """
+<style>
+/* Hide default Streamlit elements */
+.stApp > header {
+    background-color: transparent;
+}
+
+.stApp {
+    background: linear-gradient(135deg, #1a1a2e 0%, #16213e 50%, #0f3460 100%);
+}
+
+body {
+    margin: 0;
+    background: linear-gradient(135deg, #1a1a2e 0%, #16213e 50%, #0f3460 100%);
+}
+
+[data-testid="stAppViewContainer"] {
+    padding-top: 0 !important;
+}
+
+[data-testid="stAppViewContainer"] > .main {
+    padding-top: 0 !important;
+}
+
+.block-container {
+    padding-top: 2.5rem !important;
+    margin-top: 0 !important;
+}
+
+/* Main container styling - Dark theme */
+.main > div {
+    padding-top: 0 !important;
+    padding-left: 0.5rem;
+    padding-right: 0.5rem;
+}
+
+/* Remove any top margin from first elements */
+.main .block-container {
+    padding-top: 0 !important;
+    margin-top: 0 !important;
+}
+
+/* Compact Header styling - Dark */
+.chat-header {
+    background: rgba(26, 26, 46, 0.95);
+    backdrop-filter: blur(10px);
+    padding: 0.8rem 1.5rem;
+    border-radius: 0 0 15px 15px;
+    box-shadow: 0 2px 20px rgba(0, 0, 0, 0.3);
+    margin-bottom: 1rem;
+    border-bottom: 1px solid rgba(255, 255, 255, 0.1);
+    /* Own compositor layer; no paint containment so the shadow is not clipped */
+    transform: translateZ(0);
+    will-change: transform;
+    contain: layout style;
+}
+
+.chat-title {
+    font-size: 1.4rem;
+    font-weight: 700;
+    color: #ffffff;
+    margin: 0;
+    display: flex;
+    align-items: center;
+    gap: 0.5rem;
+}
+
+.chat-subtitle {
+    color: #b0b3c1;
+    font-size: 0.85rem;
+    margin-top: 0.1rem;
+}
+
+/* Chat messages area */
+.chat-messages {
+    max-height: 65vh;
+    overflow-y: auto;
+    padding: 1rem;
+    margin-bottom: 120px;
+    contain: layout paint;
+}
+
+/* Message bubble styling - Dark theme */
+.message-bubble {
+    max-width: 75%;
+    margin-bottom: 1rem;
+    /* Scope layout/paint to one bubble and skip offscreen ones */
+    contain: layout paint style;
+    content-visibility: auto;
+    contain-intrinsic-size: auto 320px auto 80px;
+    overflow-clip-margin: 10px;
+}
+
+/* Only the newest bubble fades in; the rest would replay it on every rerun */
+.message-bubble--new {
+    animation: fadeIn 0.3s ease-in;
+}
+
+@keyframes fadeIn {
+    from { opacity: 0; transform: translate3d(0, 10px, 0); }
+    to { opacity: 1; transform: translate3d(0, 0, 0); }
+}
+
+.user-message {
+    margin-left: auto;
+}
+
+.user-bubble {
+    background: #262638;
+    color: #ffffff;
+    padding: 12px 16px;
+    border-radius: 18px 18px 4px 18px;
+    box-shadow: 0 2px 8px rgba(0, 0, 0, 0.35);
+    position: relative;
+    border: 1px solid rgba(255, 255, 255, 0.12);
+}
+
+.ai-message {
+    margin-right: auto;
+}
+
+.ai-bubble {
+    background: #2d2d41;
+    color: #ffffff;
+    padding: 12px 16px;
+    border-radius: 18px 18px 18px 4px;
+    box-shadow: 0 2px 8px rgba(0, 0, 0, 0.3);
+    position: relative;
+    border: 1px solid rgba(255, 255, 255, 0.1);
+}
+
+.typing-bubble {
+    background: #2d2d41;
+    color: #ffffff;
+    padding: 10px 14px;
+    border-radius: 18px 18px 18px 4px;
+    box-shadow: 0 2px 8px rgba(0, 0, 0, 0.25);
+    border: 1px solid rgba(255, 255, 255, 0.08);
+    display: inline-flex;
+    align-items: center;
+    gap: 6px;
+}
+
+.typing-dot {
+    width: 6px;
+    height: 6px;
+    background-color: rgba(255, 255, 255, 0.7);
+    border-radius: 50%;
+    animation: typingFade 1.4s infinite;
+    transform: translateZ(0);
+    will-change: transform, opacity;
+}
+
+.typing-dot:nth-child(2) {
+    animation-delay: 0.2s;
+}
+
+.typing-dot:nth-child(3) {
+    animation-delay: 0.4s;
+}
+
+@keyframes typingFade {
+    0%, 80%, 100% { opacity: 0.2; transform: translate3d(0, 0, 0); }
+    40% { opacity: 1; transform: translate3d(0, -2px, 0); }
+}
+
+.error-bubble {
+    background: #f6625e;
+    color: white;
+    padding: 12px 16px;
+    border-radius: 18px 18px 18px 4px;
+    box-shadow: 0 2px 8px rgba(255, 107, 107, 0.3);
+    position: relative;
+}
+
+/* Message timestamp */
+.message-time {
+    font-size: 0.75rem;
+    color: rgba(255, 255, 255, 0.7);
+    margin-top: 4px;
+    text-align: right;
+}
+
+.ai-message .message-time {
+    color: #95a5a6;
+    text-align: left;
+}
+
+/* Avatar styling - Dark theme */
+.message-avatar {
+    width: 35px;
+    height: 35px;
+    border-radius: 50%;
+    margin-right: 12px;
+    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+    display: flex;
+    align-items: center;
+    justify-content: center;
+    color: white;
+    font-weight: bold;
+    font-size: 1.1rem;
+    box-shadow: 0 2px 8px rgba(0, 0, 0, 0.3);
+    flex-shrink: 0;
+    contain: strict;
+}
+
+/* Welcome message styling - Dark theme */
+.welcome-card {
+    background: rgba(45, 45, 65, 0.8);
+    border-radius: 20px;
+    padding: 2rem;
+    margin: 0.5rem 1rem 1rem 1rem;
+    box-shadow: 0 8px 32px rgba(0, 0, 0, 0.3);
+    text-align: center;
+    border: 1px solid rgba(255, 255, 255, 0.1);
+    color: #ffffff;
+}
+
+.welcome-card h2 {
+    color: #ffffff;
+    margin-bottom: 1rem;
+}
+
+/* Welcome feature cards (same palette as the st.info/success/warning overrides) */
+.feature-grid {
+    display: grid;
+    grid-template-columns: repeat(2, minmax(0, 1fr));
+    gap: 1rem;
+    margin-bottom: 1rem;
+}
+
+.feature-card {
+    border-radius: 0.5rem;
+    padding: 1rem;
+    color: #ffffff;
+}
+
+.feature-info {
+    background-color: rgba(52, 152, 219, 0.1);
+    border: 1px solid rgba(52, 152, 219, 0.3);
+}
+
+.feature-success {
+    background-color: rgba(46, 204, 113, 0.1);
+    border: 1px solid rgba(46, 204, 113, 0.3);
+}
+
+.feature-warning {
+    background-color: rgba(241, 196, 15, 0.1);
+    border: 1px solid rgba(241, 196, 15, 0.3);
+}
+
+/* Status indicators - Dark theme */
+.status-container {
+    padding: 0.5rem 1rem;
+    text-align: center;
+    margin: 1rem 0;
+}
+
+.status-success {
+    background: rgba(46, 204, 113, 0.2);
+    color: #2ecc71;
+    border-radius: 20px;
+    padding: 8px 16px;
+    font-size: 0.9rem;
+    display: inline-block;
+    border: 1px solid rgba(46, 204, 113, 0.3);
+}
+
+.status-thinking {
+    background: rgba(52, 152, 219, 0.2);
+    color: #3498db;
+    border-radius: 20px;
+    padding: 8px 16px;
+    font-size: 0.9rem;
+    display: inline-block;
+    border: 1px solid rgba(52, 152, 219, 0.3);
+}
+
+/* Clear chat button - Dark theme (.stApp prefix outranks Streamlit's own
+   single-class rules without !important) */
+.stApp .stButton > button {
+    background: rgba(231, 76, 60, 0.2);
+    color: #e74c3c;
+    border-radius: 15px;
+    border: 1px solid rgba(231, 76, 60, 0.3);
+    padding: 0.4rem 0.8rem;
+    font-weight: 600;
+    transition: all 0.3s ease;
+}
+
+.stApp .stButton > button:hover {
+    background: rgba(231, 76, 60, 0.3);
+    transform: translateY(-1px);
+    box-shadow: 0 4px 12px rgba(231, 76, 60, 0.3);
+}
+
+/* Clear chat buttons, placed through their key classes instead of st.columns */
+.st-key-clear_chat {
+    display: flex;
+    justify-content: flex-end;
+}
+
+.st-key-clear_chat_history {
+    display: flex;
+    justify-content: center;
+}
+
+/* Input area styling - Dark theme */
+.stApp .stChatInput {
+    position: fixed;
+    bottom: 0;
+    left: 0;
+    right: 0;
+    background: rgba(26, 26, 46, 0.95);
+    padding: 1rem;
+    border-top: 1px solid rgba(255, 255, 255, 0.1);
+    /* Own compositor layer so scrolling the messages does not repaint the bar */
+    transform: translateZ(0);
+    will-change: transform;
+    contain: layout paint style;
+}
+
+/* Streamlit elements dark theme */
+.stMarkdown {
+    color: #ffffff;
+}
+
+.stApp .stInfo {
+    background-color: rgba(52, 152, 219, 0.1);
+    border: 1px solid rgba(52, 152, 219, 0.3);
+    color: #ffffff;
+}
+
+.stApp .stSuccess {
+    background-color: rgba(46, 204, 113, 0.1);
+    border: 1px solid rgba(46, 204, 113, 0.3);
+    color: #ffffff;
+}
+
+.stApp .stWarning {
+    background-color: rgba(241, 196, 15, 0.1);
+    border: 1px solid rgba(241, 196, 15, 0.3);
+    color: #ffffff;
+}
+
+/* Hide scrollbar but keep functionality */
+.chat-messages::-webkit-scrollbar {
+    width: 6px;
+}
+
+.chat-messages::-webkit-scrollbar-track {
+    background: rgba(255, 255, 255, 0.05);
+    border-radius: 3px;
+}
+
+.chat-messages::-webkit-scrollbar-thumb {
+    background: rgba(255, 255, 255, 0.2);
+    border-radius: 3px;
+}
+
+.chat-messages::-webkit-scrollbar-thumb:hover {
+    background: rgba(255, 255, 255, 0.4);
+}
+
+/* Responsive design */
+@media (max-width: 768px) {
+    .message-bubble {
+        max-width: 85%;
+    }
+
+    .feature-grid {
+        grid-template-columns: 1fr;
+    }
+
+    .chat-header {
+        padding: 0.6rem 1rem;
+    }
+
+    .chat-title {
+        font-size: 1.2rem;
+    }
+}
+</style>
+"""
+_CHAT_CSS = _minify_css(_RAW_CHAT_CSS)
+
+# Avatars shared by the bubble templates below
+_AI_AVATAR = '<div class="message-avatar">🤖</div>'
+_ERR_AVATAR = '<div class="message-avatar">❌</div>'
+
+# Avatar + bubble layout; {avatar}/{bubble} are filled at import, {content}/{timestamp} per render
+_AVATAR_BUBBLE_HTML = """<div class="message-bubble ai-message">
+<div style="display: flex; align-items: flex-start;">
+{avatar}
+<div class="{bubble}" style="flex: 1;">
+{{content}}
+<div class="message-time">{{timestamp}}</div>
+</div>
+</div>
+</div>"""
+
+# Message bubble HTML by message type. Lines start at column 0 so markdown never
+# mistakes them for an indented code block, even after multi-line content.
+_MESSAGE_HTML = {
+    "human": """<div class="message-bubble user-message">
+<div class="user-bubble">
+{content}
+<div class="message-time">{timestamp}</div>
+</div>
+</div>""",
+    "ai": _AVATAR_BUBBLE_HTML.format(avatar=_AI_AVATAR, bubble="ai-bubble"),
+    "error": _AVATAR_BUBBLE_HTML.format(avatar=_ERR_AVATAR, bubble="error-bubble"),
+    "typing": f"""<div class="message-bubble ai-message">
+<div style="display: flex; align-items: center;">
+{_AI_AVATAR}
+<div class="typing-bubble">
+<span class="typing-dot"></span>
+<span class="typing-dot"></span>
+<span class="typing-dot"></span>
+</div>
+</div>
+</div>""",
+}
+
+# Welcome screen for an empty chat, sent as one element. No blank lines, so the
+# whole string stays a single raw HTML block for the markdown parser.
+_WELCOME_HTML = """<div style="text-align: center; padding: 0 1rem 1rem; color: #ffffff; margin: 0;">
+<h2 style="color: #ffffff; margin: 0 0 1rem;">👋 Welcome to AI File Search!</h2>
+<p style="font-size: 1.1rem; color: #b0b3c1; margin: 0 0 1rem;">
+I'm your intelligent assistant ready to help you find and manage files on your system.
+</p>
+</div>
+<h3>🚀 What I can do:</h3>
+<div class="feature-grid">
+<div class="feature-card feature-info"><strong>🔍 Smart Search</strong><br>Find files by name, type, or content</div>
+<div class="feature-card feature-info"><strong>📂 File Management</strong><br>Open, and navigate folders</div>
+<div class="feature-card feature-success"><strong>🤖 AI Assistance</strong><br>Natural language file operations</div>
+<div class="feature-card feature-warning"><strong>⚡ Quick Actions</strong><br>Instant file opening and navigation</div>
+</div>
+<h3>💬 Try these examples:</h3>
+<ul>
+<li><em>"Find my Excel files from last week"</em></li>
+<li><em>"Open my Documents folder"</em></li>
+<li><em>"Look for files containing 'budget'"</em></li>
+<li><em>"Show me my recent downloads"</em></li>
+</ul>
+<p style="text-align: center; margin-top: 2rem; color: #95a5a6; font-style: italic;">
+Just type your request below to get started! 🎯
+</p>"""
+
+# Plain-text message types whose content is HTML-escaped; AI replies are markdown
+_ESCAPED_MESSAGE_TYPES = frozenset({"human", "error"})
+
+# Rendered bubbles kept for messages that carry an id (finalized history entries)
+MESSAGE_HTML_CACHE_SIZE = 2048
+
+
+def _render_message(message_type: str, content: str, timestamp: str) -> str:
+    """Fill the bubble template for one message ("" for unknown message types)."""
+    template = _MESSAGE_HTML.get(message_type)
+    if template is None:
+        return ""
+    if message_type in _ESCAPED_MESSAGE_TYPES:
+        content = html.escape(content)
+    return template.format(content=content, timestamp=timestamp)
+
+
+@lru_cache(maxsize=MESSAGE_HTML_CACHE_SIZE)
+def _render_message_cached(msg_id: str, message_type: str, content: str, timestamp: str) -> str:
+    """``_render_message`` memoized per message id, so reruns reuse finished bubbles."""
+    return _render_message(message_type, content, timestamp)
 
 
 class ChatUI:
     """Modern chat interface components for Streamlit."""
     
+    # Number of most recent messages rendered; "Load earlier" widens it by this much
+    HISTORY_WINDOW = 50
+    
     @staticmethod
     def inject_custom_css():
         """Inject custom CSS for modern dark WhatsApp-like styling."""
-        st.markdown("""
-        <style>
-        /* Hide default Streamlit elements */
-        .stApp > header {
-            background-color: transparent;
-        }
-        
-        .stApp {
-            background: linear-gradient(135deg, #1a1a2e 0%, #16213e 50%, #0f3460 100%);
-        }
-        
-        body {
-            margin: 0;
-            background: linear-gradient(135deg, #1a1a2e 0%, #16213e 50%, #0f3460 100%);
-        }
-
-        [data-testid="stAppViewContainer"] {
-            padding-top: 0 !important;
-        }
-
-        [data-testid="stAppViewContainer"] > .main {
-            padding-top: 0 !important;
-        }
-
-        .block-container {
-            padding-top: 2.5rem !important;
-            margin-top: 0 !important;
-        }
-
-        /* Main container styling - Dark theme */
-        .main > div {
-            padding-top: 0 !important;
-            padding-left: 0.5rem;
-            padding-right: 0.5rem;
-        }
-        
-        /* Remove any top margin from first elements */
-        .main .block-container {
-            padding-top: 0 !important;
-            margin-top: 0 !important;
-        }
-        
-        /* Compact Header styling - Dark */
-        .chat-header {
-            background: rgba(26, 26, 46, 0.95);
-            backdrop-filter: blur(10px);
-            padding: 0.8rem 1.5rem;
-            border-radius: 0 0 15px 15px;
-            box-shadow: 0 2px 20px rgba(0, 0, 0, 0.3);
-            margin-bottom: 1rem;
-            border-bottom: 1px solid rgba(255, 255, 255, 0.1);
-        }
-        
-        .chat-title {
-            font-size: 1.4rem;
-            font-weight: 700;
-            color: #ffffff;
-            margin: 0;
-            display: flex;
-            align-items: center;
-            gap: 0.5rem;
-        }
-        
-        .chat-subtitle {
-            color: #b0b3c1;
-            font-size: 0.85rem;
-            margin-top: 0.1rem;
-        }
-        
-        /* Chat messages area */
-        .chat-messages {
-            max-height: 65vh;
-            overflow-y: auto;
-            padding: 1rem;
-            margin-bottom: 120px;
-        }
-        
-        /* Message bubble styling - Dark theme */
-        .message-bubble {
-            max-width: 75%;
-            margin-bottom: 1rem;
-            animation: fadeIn 0.3s ease-in;
-        }
-        
-        @keyframes fadeIn {
-            from { opacity: 0; transform: translateY(10px); }
-            to { opacity: 1; transform: translateY(0); }
-        }
-        
-        .user-message {
-            margin-left: auto;
-        }
-        
-        .user-bubble {
-            background: linear-gradient(135deg, #2c2c44 0%, #1f1f30 100%);
-            color: #ffffff;
-            padding: 12px 16px;
-            border-radius: 18px 18px 4px 18px;
-            box-shadow: 0 2px 8px rgba(0, 0, 0, 0.35);
-            position: relative;
-            border: 1px solid rgba(255, 255, 255, 0.12);
-        }
-        
-        .ai-message {
-            margin-right: auto;
-        }
-        
-        .ai-bubble {
-            background: rgba(45, 45, 65, 0.9);
-            color: #ffffff;
-            padding: 12px 16px;
-            border-radius: 18px 18px 18px 4px;
-            box-shadow: 0 2px 8px rgba(0, 0, 0, 0.3);
-            backdrop-filter: blur(10px);
-            position: relative;
-            border: 1px solid rgba(255, 255, 255, 0.1);
-        }
-
-        .typing-bubble {
-            background: rgba(45, 45, 65, 0.85);
-            color: #ffffff;
-            padding: 10px 14px;
-            border-radius: 18px 18px 18px 4px;
-            box-shadow: 0 2px 8px rgba(0, 0, 0, 0.25);
-            border: 1px solid rgba(255, 255, 255, 0.08);
-            display: inline-flex;
-            align-items: center;
-            gap: 6px;
-        }
-
-        .typing-dot {
-            width: 6px;
-            height: 6px;
-            background-color: rgba(255, 255, 255, 0.7);
-            border-radius: 50%;
-            animation: typingFade 1.4s infinite;
-        }
-
-        .typing-dot:nth-child(2) {
-            animation-delay: 0.2s;
-        }
-
-        .typing-dot:nth-child(3) {
-            animation-delay: 0.4s;
-        }
-
-        @keyframes typingFade {
-            0%, 80%, 100% { opacity: 0.2; transform: translateY(0); }
-            40% { opacity: 1; transform: translateY(-2px); }
-        }
-        
-        .error-bubble {
-            background: linear-gradient(135deg, #ff6b6b 0%, #ee5a52 100%);
-            color: white;
-            padding: 12px 16px;
-            border-radius: 18px 18px 18px 4px;
-            box-shadow: 0 2px 8px rgba(255, 107, 107, 0.3);
-            position: relative;
-        }
-        
-        /* Message timestamp */
-        .message-time {
-            font-size: 0.75rem;
-            color: rgba(255, 255, 255, 0.7);
-            margin-top: 4px;
-            text-align: right;
-        }
-        
-        .ai-message .message-time {
-            color: #95a5a6;
-            text-align: left;
-        }
-        
-        /* Avatar styling - Dark theme */
-        .message-avatar {
-            width: 35px;
-            height: 35px;
-            border-radius: 50%;
-            margin-right: 12px;
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            color: white;
-            font-weight: bold;
-            font-size: 1.1rem;
-            box-shadow: 0 2px 8px rgba(0, 0, 0, 0.3);
-        }
-        
-        /* Welcome message styling - Dark theme */
-        .welcome-card {
-            background: rgba(45, 45, 65, 0.8);
-            backdrop-filter: blur(10px);
-            border-radius: 20px;
-            padding: 2rem;
-            margin: 0.5rem 1rem 1rem 1rem;
-            box-shadow: 0 8px 32px rgba(0, 0, 0, 0.3);
-            text-align: center;
-            border: 1px solid rgba(255, 255, 255, 0.1);
-            color: #ffffff;
-        }
-        
-        .welcome-card h2 {
-            color: #ffffff;
-            margin-bottom: 1rem;
-        }
-        
-        /* Status indicators - Dark theme */
-        .status-container {
-            padding: 0.5rem 1rem;
-            text-align: center;
-            margin: 1rem 0;
-        }
-        
-        .status-success {
-            background: rgba(46, 204, 113, 0.2);
-            color: #2ecc71;
-            border-radius: 20px;
-            padding: 8px 16px;
-            font-size: 0.9rem;
-            display: inline-block;
-            border: 1px solid rgba(46, 204, 113, 0.3);
-        }
-        
-        .status-thinking {
-            background: rgba(52, 152, 219, 0.2);
-            color: #3498db;
-            border-radius: 20px;
-            padding: 8px 16px;
-            font-size: 0.9rem;
-            display: inline-block;
-            border: 1px solid rgba(52, 152, 219, 0.3);
-        }
-        
-        /* Clear chat button - Dark theme */
-        .stButton > button {
-            background: rgba(231, 76, 60, 0.2) !important;
-            color: #e74c3c !important;
-            border-radius: 15px !important;
-            border: 1px solid rgba(231, 76, 60, 0.3) !important;
-            padding: 0.4rem 0.8rem !important;
-            font-weight: 600 !important;
-            transition: all 0.3s ease !important;
-        }
-        
-        .stButton > button:hover {
-            background: rgba(231, 76, 60, 0.3) !important;
-            transform: translateY(-1px) !important;
-            box-shadow: 0 4px 12px rgba(231, 76, 60, 0.3) !important;
-        }
-        
-        /* Input area styling - Dark theme */
-        .stChatInput {
-            position: fixed !important;
-            bottom: 0 !important;
-            left: 0 !important;
-            right: 0 !important;
-            background: rgba(26, 26, 46, 0.95) !important;
-            backdrop-filter: blur(10px) !important;
-            padding: 1rem !important;
-            border-top: 1px solid rgba(255, 255, 255, 0.1) !important;
-        }
-        
-        /* Streamlit elements dark theme */
-        .stMarkdown {
-            color: #ffffff;
-        }
-        
-        .stInfo {
-            background-color: rgba(52, 152, 219, 0.1) !important;
-            border: 1px solid rgba(52, 152, 219, 0.3) !important;
-            color: #ffffff !important;
-        }
-        
-        .stSuccess {
-            background-color: rgba(46, 204, 113, 0.1) !important;
-            border: 1px solid rgba(46, 204, 113, 0.3) !important;
-            color: #ffffff !important;
-        }
-        
-        .stWarning {
-            background-color: rgba(241, 196, 15, 0.1) !important;
-            border: 1px solid rgba(241, 196, 15, 0.3) !important;
-            color: #ffffff !important;
-        }
-        
-        /* Hide scrollbar but keep functionality */
-        .chat-messages::-webkit-scrollbar {
-            width: 6px;
-        }
-        
-        .chat-messages::-webkit-scrollbar-track {
-            background: rgba(255, 255, 255, 0.05);
-            border-radius: 3px;
-        }
-        
-        .chat-messages::-webkit-scrollbar-thumb {
-            background: rgba(255, 255, 255, 0.2);
-            border-radius: 3px;
-        }
-        
-        .chat-messages::-webkit-scrollbar-thumb:hover {
-            background: rgba(255, 255, 255, 0.4);
-        }
-        
-        /* Responsive design */
-        @media (max-width: 768px) {
-            .message-bubble {
-                max-width: 85%;
-            }
-            
-            .chat-header {
-                padding: 0.6rem 1rem;
-            }
-            
-            .chat-title {
-                font-size: 1.2rem;
-            }
-        }
-        </style>
-        """, unsafe_allow_html=True)
+        st.markdown(_CHAT_CSS, unsafe_allow_html=True)
     
     @staticmethod
     def display_message(message: Dict[str, Any], avatar: str = None):
         """Display a chat message with WhatsApp-like styling."""
-        timestamp = datetime.now().strftime("%H:%M")
+        if message["type"] == "typing":
+            timestamp = ""
+        else:
+            # Messages carry their creation time; "now" only for older entries without one
+            timestamp = message.get("ts") or datetime.now().strftime("%H:%M")
         
-        if message["type"] == "human":
-            st.markdown(f"""
-            <div class="message-bubble user-message">
-                <div class="user-bubble">
-                    {message["content"]}
-                    <div class="message-time">{timestamp}</div>
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
-            
-        elif message["type"] == "ai":
-            st.markdown(f"""
-            <div class="message-bubble ai-message">
-                <div style="display: flex; align-items: flex-start;">
-                    <div class="message-avatar">🤖</div>
-                    <div class="ai-bubble" style="flex: 1;">
-                        {message["content"]}
-                        <div class="message-time">{timestamp}</div>
-                    </div>
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
-            
-        elif message["type"] == "error":
-            st.markdown(f"""
-            <div class="message-bubble ai-message">
-                <div style="display: flex; align-items: flex-start;">
-                    <div class="message-avatar">❌</div>
-                    <div class="error-bubble" style="flex: 1;">
-                        {message["content"]}
-                        <div class="message-time">{timestamp}</div>
-                    </div>
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
-        elif message["type"] == "typing":
-            st.markdown("""
-            <div class="message-bubble ai-message">
-                <div style="display: flex; align-items: center;">
-                    <div class="message-avatar">🤖</div>
-                    <div class="typing-bubble">
-                        <span class="typing-dot"></span>
-                        <span class="typing-dot"></span>
-                        <span class="typing-dot"></span>
-                    </div>
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
+        bubble_html = ChatUI._message_html(message, timestamp)
+        if bubble_html:
+            st.markdown(bubble_html, unsafe_allow_html=True)
+    
+    @staticmethod
+    def _message_html(message: Dict[str, Any], timestamp: str) -> str:
+        """Build the bubble HTML for one message ("" for unknown message types).
+        
+        The message's own "ts" wins over ``timestamp``, which is only a fallback.
+        """
+        message_type = message["type"]
+        if message_type == "typing":
+            return _MESSAGE_HTML["typing"]
+        
+        content = message.get("content", "")
+        timestamp = message.get("ts") or timestamp
+        msg_id = message.get("id")
+        if msg_id is not None and isinstance(content, str):
+            return _render_message_cached(msg_id, message_type, content, timestamp)
+        return _render_message(message_type, content, timestamp)
     
     @staticmethod
     def display_chat_history(messages: List[Dict[str, Any]]):
-        """Display the entire chat history with modern styling."""
+        """Display the most recent window of the chat history with modern styling."""
         if messages:
-            st.markdown('<div class="chat-messages">', unsafe_allow_html=True)
-            for message in messages:
-                ChatUI.display_message(message)
-            st.markdown('</div>', unsafe_allow_html=True)
+            window = st.session_state.get("msg_window", ChatUI.HISTORY_WINDOW)
+            visible = messages[-window:]
+            
+            # Fallback time for messages recorded before timestamps were stored
+            timestamp = ""
+            if any("ts" not in message for message in visible):
+                timestamp = datetime.now().strftime("%H:%M")
+            
+            # One markdown element for the whole window instead of one per message
+            bubbles = [ChatUI._message_html(message, timestamp) for message in visible]
+            bubbles[-1] = bubbles[-1].replace('class="message-bubble ', 'class="message-bubble message-bubble--new ', 1)
+            st.markdown("\n\n".join(bubbles), unsafe_allow_html=True)
+    
+    @staticmethod
+    @st.fragment
+    def display_chat_fragment():
+        """Display the chat history as a fragment so its own widgets rerun only this section."""
+        messages = st.session_state.get("chat_history", [])
+        ChatUI.display_load_earlier_button(messages)
+        ChatUI.display_chat_history(messages)
+    
+    @staticmethod
+    def display_load_earlier_button(messages: List[Dict[str, Any]]):
+        """Offer to render older messages hidden by the history window."""
+        window = st.session_state.get("msg_window", ChatUI.HISTORY_WINDOW)
+        if len(messages) > window:
+            st.button("⬆️ Load earlier messages", key="load_earlier_messages",
+                      on_click=ChatUI._widen_history_window)
+    
+    @staticmethod
+    def _widen_history_window():
+        """Button callback: render another HISTORY_WINDOW older messages."""
+        window = st.session_state.get("msg_window", ChatUI.HISTORY_WINDOW)
+        st.session_state.msg_window = window + ChatUI.HISTORY_WINDOW
     
     @staticmethod
     def display_status(status_type: str, message: str):
@@ -454,14 +633,16 @@ class MainUI:
         </div>
         """, unsafe_allow_html=True)
         
-        # Clear chat button (positioned in a separate small container)
-        col1, col2 = st.columns([8, 1])
-        with col2:
-            if st.button("🗑️", key="clear_chat", help="Clear conversation history"):
-                st.session_state.chat_history = []
-                import uuid
-                st.session_state.thread_id = str(uuid.uuid4())[:8]
-                st.rerun()
+        # Clear chat button (right-aligned by its .st-key-clear_chat CSS rule)
+        st.button("🗑️", key="clear_chat", help="Clear conversation history",
+                  on_click=MainUI._clear_chat)
+    
+    @staticmethod
+    def _clear_chat():
+        """Button callback: start a new conversation with an empty history."""
+        st.session_state.chat_history = []
+        st.session_state.pop("msg_window", None)
+        st.session_state.thread_id = uuid.uuid4().hex[:8]
     
     @staticmethod
     def display_connection_status():
@@ -479,79 +660,20 @@ class MainUI:
     @staticmethod
     def display_welcome_message():
         """Display modern welcome message for new users."""
-        if not st.session_state.get("chat_history"):
-            # Simple welcome text without card styling
-            st.markdown("""
-            <div style=\"text-align: center; padding: 0 1rem 1rem; color: #ffffff; margin: 0;\">
-                <h2 style=\"color: #ffffff; margin: 0 0 1rem;\">👋 Welcome to AI File Search!</h2>
-                <p style=\"font-size: 1.1rem; color: #b0b3c1; margin: 0 0 1rem;\">
-                    I'm your intelligent assistant ready to help you find and manage files on your system.
-                </p>
-            </div>
-            """, unsafe_allow_html=True)
-            
-            # Create feature cards using Streamlit columns
-            st.markdown("### 🚀 What I can do:")
-            
-            col1, col2 = st.columns(2)
-            with col1:
-                st.info("""
-                **🔍 Smart Search**  
-                Find files by name, type, or content
-                """)
-                st.success("""
-                **🤖 AI Assistance**  
-                Natural language file operations
-                """)
-            
-            with col2:
-                st.info("""
-                **📂 File Management**  
-                Open, and navigate folders
-                """)
-                st.warning("""
-                **⚡ Quick Actions**  
-                Instant file opening and navigation
-                """)
-            
-            # Examples section
-            st.markdown("### 💬 Try these examples:")
-            st.markdown("""
-            - *"Find my Excel files from last week"*
-            - *"Open my Documents folder"*  
-            - *"Look for files containing 'budget'"*
-            - *"Show me my recent downloads"*
-            """)
-            
-            st.markdown("""
-            <p style="text-align: center; margin-top: 2rem; color: #95a5a6; font-style: italic;">
-                Just type your request below to get started! 🎯
-            </p>
-            """, unsafe_allow_html=True)
-        else:
-            # Show clear chat button when there's chat history
-            col1, col2, col3 = st.columns([4, 1, 4])
-            with col2:
-                if st.button("🗑️ Clear Chat", key="clear_chat_history"):
-                    st.session_state.chat_history = []
-                    import uuid
-                    st.session_state.thread_id = str(uuid.uuid4())[:8]
-                    st.rerun()
+        if st.session_state.get("chat_history"):
+            # Show clear chat button when there's chat history (centred via CSS)
+            st.button("🗑️ Clear Chat", key="clear_chat_history", on_click=MainUI._clear_chat)
+            return
+        
+        st.markdown(_WELCOME_HTML, unsafe_allow_html=True)
     
     @staticmethod
     def display_error_message(error: str):
         """Display error message with modern styling."""
-        st.markdown(f"""
-        <div class="message-bubble ai-message">
-            <div style="display: flex; align-items: flex-start;">
-                <div class="message-avatar">❌</div>
-                <div class="error-bubble" style="flex: 1;">
-                    <strong>Error:</strong> {error}
-                    <div class="message-time">{datetime.now().strftime("%H:%M")}</div>
-                </div>
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
+        st.markdown(_MESSAGE_HTML["error"].format(
+            content=f"<strong>Error:</strong> {html.escape(error)}",
+            timestamp=datetime.now().strftime("%H:%M"),
+        ), unsafe_allow_html=True)
     
     @staticmethod
     def display_success_message(message: str):
@@ -1,4 +1,7 @@
 @echo off
+REM Pass /nopause when run unattended (the update manager does) so the script exits on its own
+set PAUSE=pause
+if /i "%~1"=="/nopause" set PAUSE=rem
 echo.
 echo ============================================================
 echo   Local Agent - Frontend Update Script
@@ -19,7 +22,7 @@ echo Downloading from GitHub...
 powershell -Command "Invoke-WebRequest -Uri '%REPO_URL%' -OutFile '%ZIP_FILE%' -UseBasicParsing"
 if %ERRORLEVEL% NEQ 0 (
     echo Failed to download repository
-    pause
+    %PAUSE%
     exit /b 1
 )
 
@@ -34,7 +37,7 @@ if exist "%TEMP_EXTRACT%" rmdir /s /q "%TEMP_EXTRACT%"
 powershell -Command "Expand-Archive -Path '%ZIP_FILE%' -DestinationPath '%TEMP_EXTRACT%' -Force"
 if %ERRORLEVEL% NEQ 0 (
     echo Failed to extract archive
-    pause
+    %PAUSE%
     exit /b 1
 )
 
@@ -96,7 +99,7 @@ call npm install
 if %ERRORLEVEL% NEQ 0 (
     echo Warning: npm install encountered errors
     echo You may need to run 'npm install' manually
-    pause
+    %PAUSE%
 )
 
 echo.
@@ -122,7 +125,7 @@ if %ERRORLEVEL% NEQ 0 (
     echo You can still run the app with: npm start
     echo.
     echo ============================================================
-    pause
+    %PAUSE%
     exit /b 1
 )
 
@@ -163,4 +166,4 @@ echo   - Double-click "LEKHA" on desktop
 echo   - Or run: cd frontend ^&^& npm start
 echo.
 echo ============================================================
-pause
+%PAUSE%
@@ -2,107 +2,240 @@
 Update management endpoints for Local Agent
 Handles backend and frontend updates via API
 """
+import asyncio
+import json
 import os
 import subprocess
-import threading
-from fastapi import APIRouter, HTTPException
+import time
+from dataclasses import asdict, dataclass, replace
+import xxhash
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Request
+from fastapi.responses import Response
 from pydantic import BaseModel
 import logging
 
+# orjson serializes several times faster than the stdlib; fall back when absent
+try:
+    from orjson import dumps as _json_bytes
+except ImportError:
+    def _json_bytes(obj) -> bytes:
+        return json.dumps(obj).encode("utf-8")
+
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# Update scripts live in the directory above the project; resolved once at import
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_SCRIPTS = {
+    "backend": os.path.join(_PROJECT_ROOT, "update_backend.bat"),
+    "frontend": os.path.join(_PROJECT_ROOT, "update_frontend.bat"),
+}
+for _script_path in _SCRIPTS.values():
+    if not os.path.exists(_script_path):
+        logger.warning("Update script not found: %s", _script_path)
+
+# Extra arguments per script; /nopause skips the frontend script's closing "press any key"
+_SCRIPT_ARGS = {
+    "backend": [],
+    "frontend": ["/nopause"],
+}
+
+# Windows-only Popen flag; 0 elsewhere so the module still imports and launches
+_CREATE_NEW_CONSOLE = getattr(subprocess, "CREATE_NEW_CONSOLE", 0)
+
+# Status and message reported once each script has been launched
+_LAUNCH_SPEC = {
+    "backend": ("initiated", "Backend update initiated. Server will restart automatically."),
+    "frontend": ("success", "Frontend update started successfully"),
+}
+
+@dataclass(frozen=True, slots=True)
+class UpdateState:
+    """Immutable status snapshot of one update; replaced whole on every transition."""
+    running: bool = False
+    status: str = "idle"
+    message: str = ""
+
 # Track update status
 update_status = {
-    "backend": {"running": False, "status": "idle", "message": ""},
-    "frontend": {"running": False, "status": "idle", "message": ""}
+    "backend": UpdateState(),
+    "frontend": UpdateState()
 }
 
+# Serialized update_status for the status endpoint and its ETag; None once a field changes
+_status_json = None
+_status_etag = None
+
+# Held from the update request until both update scripts have exited
+_update_lock = asyncio.Lock()
+
+# Seconds between checks for an update script having exited
+PROCESS_POLL_INTERVAL = 1.0
+
+# Seconds an update script may run before it is killed (npm install can wedge on the network)
+UPDATE_SCRIPT_TIMEOUT = float(os.getenv("UPDATE_SCRIPT_TIMEOUT", "1800"))
+
+# Running update script processes by update type, for timeouts and /update/cancel
+_procs = {}
+
+# Set by /update/cancel so scripts still queued are not started
+_cancel_requested = asyncio.Event()
+
+def set_status(update_type: str, **fields):
+    """Swap in a new status snapshot and invalidate the cached status JSON.
+
+    Readers see either the old or the new snapshot, never a half-applied one.
+    """
+    global _status_json
+    update_status[update_type] = replace(update_status[update_type], **fields)
+    _status_json = None
+
 class UpdateResponse(BaseModel):
     success: bool
     message: str
     status: str
 
-def run_update_script(script_name: str, update_type: str):
-    """Run update script in background"""
-    global update_status
-    
+async def run_update_script(update_type: str):
+    """Run update script in background on the server's event loop.
+
+    Popen only spawns the script and returns, so it is called directly here.
+    asyncio.create_subprocess_exec is not used: uvicorn runs a SelectorEventLoop
+    on Windows when reload is on, and that loop has no subprocess support.
+    """
     try:
-        # Get the project root directory (where the script should be)
-        project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        script_path = os.path.join(project_root, script_name)
+        script_path = _SCRIPTS[update_type]
         
+        # Still checked per run: the scripts may be installed after the server started
         if not os.path.exists(script_path):
-            update_status[update_type]["status"] = "error"
-            update_status[update_type]["message"] = f"Script not found: {script_path}"
-            update_status[update_type]["running"] = False
-            return
+            set_status(update_type, status="error", message=f"Script not found: {script_path}", running=False)
+            return None
         
-        update_status[update_type]["status"] = "running"
-        update_status[update_type]["message"] = f"Updating {update_type}..."
+        set_status(update_type, status="running", message=f"Updating {update_type}...")
         
-        # Run the batch script
-        logger.info(f"Running update script: {script_path}")
+        # Run the batch script (CreateProcess runs a .bat given by full path, no shell needed)
+        logger.info("Running update script: %s", script_path)
         
-        # For backend updates, run in a way that allows server restart
-        if update_type == "backend":
-            # Start the script and detach (it will handle stopping/restarting the server)
-            subprocess.Popen(
-                [script_path],
-                cwd=project_root,
-                shell=True,
-                creationflags=subprocess.CREATE_NEW_CONSOLE
-            )
-            update_status[update_type]["status"] = "initiated"
-            update_status[update_type]["message"] = "Backend update initiated. Server will restart automatically."
-        else:
-            # For frontend, run in background
-            process = subprocess.Popen(
-                [script_path],
-                cwd=project_root,
-                shell=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                creationflags=subprocess.CREATE_NEW_CONSOLE
-            )
-            
-            update_status[update_type]["status"] = "success"
-            update_status[update_type]["message"] = f"{update_type.capitalize()} update started successfully"
+        # Each script gets its own console window for its output (an unread PIPE
+        # would stall it once the pipe buffer filled); the backend script stops
+        # and restarts this server itself
+        process = subprocess.Popen(
+            [script_path, *_SCRIPT_ARGS[update_type]],
+            cwd=_PROJECT_ROOT,
+            creationflags=_CREATE_NEW_CONSOLE
+        )
+        _procs[update_type] = process
+        status, message = _LAUNCH_SPEC[update_type]
+        set_status(update_type, status=status, message=message)
         
-        update_status[update_type]["running"] = False
+        return process
         
     except Exception as e:
-        logger.error(f"Error running {update_type} update: {e}")
-        update_status[update_type]["status"] = "error"
-        update_status[update_type]["message"] = str(e)
-        update_status[update_type]["running"] = False
+        logger.error("Error running %s update: %s", update_type, e)
+        set_status(update_type, status="error", message=str(e), running=False)
+        return None
+
+def _kill_process_tree(process: subprocess.Popen):
+    """Kill an update script together with the commands it started."""
+    if os.name == "nt":
+        # The .bat runs in cmd.exe; killing only that would orphan npm/powershell
+        subprocess.Popen(
+            ["taskkill", "/F", "/T", "/PID", str(process.pid)],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+    else:
+        process.kill()
+
+async def _wait_for_exit(process: subprocess.Popen, update_type: str):
+    """Poll until an update script exits (Popen.wait() would block the event loop).
+
+    A script still running after UPDATE_SCRIPT_TIMEOUT seconds is killed.
+    """
+    deadline = time.monotonic() + UPDATE_SCRIPT_TIMEOUT
+    while process.poll() is None:
+        if deadline is not None and time.monotonic() >= deadline:
+            logger.warning("%s update still running after %ss, killing it", update_type, UPDATE_SCRIPT_TIMEOUT)
+            _kill_process_tree(process)
+            set_status(update_type, status="error",
+                       message=f"{update_type.capitalize()} update timed out after {UPDATE_SCRIPT_TIMEOUT:.0f}s")
+            deadline = None
+        await asyncio.sleep(PROCESS_POLL_INTERVAL)
+    _procs.pop(update_type, None)
+    
+    if deadline is None:
+        set_status(update_type, running=False)
+    elif process.returncode != 0:
+        set_status(update_type, status="error", running=False,
+                   message=f"{update_type.capitalize()} update failed (exit code {process.returncode})")
+    else:
+        set_status(update_type, status="success", running=False,
+                   message=f"{update_type.capitalize()} update completed")
+
+async def _run_updates():
+    """Run the update scripts one after another and then release the update lock.
+
+    The frontend goes first: the backend script stops this server, which would
+    end this task before a later step could start.
+    """
+    try:
+        set_status("backend", status="queued", message="Waiting for the frontend update to finish...")
+        for update_type in ("frontend", "backend"):
+            if _cancel_requested.is_set():
+                set_status(update_type, status="cancelled", message="Update cancelled", running=False)
+                continue
+            process = await run_update_script(update_type)
+            if process is not None:
+                await _wait_for_exit(process, update_type)
+    finally:
+        _update_lock.release()
+
+# Constant reply of a started update, serialized once at import
+_STARTED_RESPONSE = UpdateResponse(
+    success=True,
+    message="Application update started. Your indexed documents are safe. Console windows will show progress.",
+    status="initiated"
+)
+_STARTED_JSON = _json_bytes(_STARTED_RESPONSE.model_dump())
 
 @router.post("/update/app", response_model=UpdateResponse)
-async def update_app():
+async def update_app(background_tasks: BackgroundTasks):
     """Update entire application from GitHub - preserves indexed documents"""
     
-    if update_status["backend"]["running"] or update_status["frontend"]["running"]:
+    if _update_lock.locked():
         raise HTTPException(status_code=409, detail="Update already in progress")
+    await _update_lock.acquire()
+    _cancel_requested.clear()
+    
+    # Run the frontend and then the backend update; _run_updates releases the lock
+    set_status("backend", running=True)
+    set_status("frontend", running=True)
+    background_tasks.add_task(_run_updates)
     
-    # Start backend update first
-    update_status["backend"]["running"] = True
-    thread_backend = threading.Thread(target=run_update_script, args=("update_backend.bat", "backend"))
-    thread_backend.daemon = True
-    thread_backend.start()
+    return Response(content=_STARTED_JSON, media_type="application/json")
+
+@router.get("/update/status", response_class=Response)
+async def get_update_status(request: Request):
+    """Get current update status (serialized once per change, 304 when unchanged)"""
+    global _status_json, _status_etag
+    if _status_json is None:
+        _status_json = _json_bytes({name: asdict(state) for name, state in update_status.items()})
+        _status_etag = f'"{xxhash.xxh3_64(_status_json).hexdigest()}"'
+    
+    # no-cache makes browsers revalidate each poll with If-None-Match
+    headers = {"ETag": _status_etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == _status_etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=_status_json, media_type="application/json", headers=headers)
+
+@router.post("/update/cancel", response_model=UpdateResponse)
+async def cancel_update():
+    """Kill the running update script and skip any that are still queued"""
+    if not _update_lock.locked():
+        raise HTTPException(status_code=409, detail="No update in progress")
     
-    # Start frontend update
-    update_status["frontend"]["running"] = True
-    thread_frontend = threading.Thread(target=run_update_script, args=("update_frontend.bat", "frontend"))
-    thread_frontend.daemon = True
-    thread_frontend.start()
+    _cancel_requested.set()
+    for update_type, process in list(_procs.items()):
+        _kill_process_tree(process)
+        set_status(update_type, status="cancelled", message="Update cancelled")
     
-    return UpdateResponse(
-        success=True,
-        message="Application update started. Your indexed documents are safe. Console windows will show progress.",
-        status="initiated"
-    )
-
-@router.get("/update/status")
-async def get_update_status():
-    """Get current update status"""
-    return update_status
+    return UpdateResponse(success=True, message="Update cancelled", status="cancelled")
@@ -4,12 +4,14 @@ import time
 import shutil
 import logging
 import psutil
+import itertools
 import json
+import queue
 import threading
+import uuid
 from datetime import datetime, timedelta
 from pathlib import Path
 from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
-from langchain.schema import Document
 from langchain_openai import OpenAIEmbeddings
 from langchain_chroma import Chroma
 from dotenv import load_dotenv
@@ -35,6 +37,22 @@ logging.basicConfig(level=logging.INFO)
 _GLOBAL_HF_EMBEDDINGS_CACHE = None
 _GLOBAL_HF_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
 
+# Dynamic int8 quantization of the model's Linear layers on CPU (opt in with HF_EMBEDDINGS_INT8=1).
+# Vectors differ slightly from the FP32 model's, so force a full rebuild after changing it
+HF_EMBEDDINGS_INT8 = os.getenv("HF_EMBEDDINGS_INT8", "0") == "1"
+
+# Rows per Chroma insert call - stays under Chroma's max batch size
+CHROMA_INSERT_BATCH_SIZE = 5000
+
+# Paths per "$in" filter when deleting - keeps the SQL variable count bounded
+CHROMA_DELETE_BATCH_SIZE = 500
+
+# OpenAI embedding requests kept in flight during incremental updates
+OPENAI_EMBED_CONCURRENCY = 8
+
+# Directory match lists buffered between scanning and embedding - scanning blocks when embedding falls behind
+SCAN_QUEUE_MAXSIZE = 10_000
+
 def get_cached_hf_embeddings():
     """Get cached HuggingFace embeddings with GPU optimization."""
     global _GLOBAL_HF_EMBEDDINGS_CACHE
@@ -67,15 +85,18 @@ def get_cached_hf_embeddings():
             gpu_name = torch.cuda.get_device_name(0)
             gpu_memory = torch.cuda.get_device_properties(0).total_memory / 1024**3
             print(f"🚀 GPU detected: {gpu_name} ({gpu_memory:.1f} GB)")
-            
-            # Use float16 for 2x speed boost on GPU
-            try:
-                model_kwargs['torch_dtype'] = torch.float16
-                print("⚡ Using FP16 precision for 2x speed boost")
-            except:
-                print("⚠️  FP16 not available, using FP32")
         else:
             print(f"💻 Using CPU (no GPU detected)")
+            
+            # One intra-op thread per physical core (cpu_count counts SMT siblings)
+            num_threads = max(1, (os.cpu_count() or 1) // 2)
+            torch.set_num_threads(num_threads)
+            try:
+                torch.set_num_interop_threads(2)
+            except RuntimeError:
+                # Only settable before the first inter-op parallel work in the process
+                pass
+            print(f"🧵 Torch threads: {torch.get_num_threads()} intra-op, {torch.get_num_interop_threads()} inter-op")
         
         # Encoding configuration with optimized batch size
         encode_kwargs = {
@@ -106,6 +127,21 @@ def get_cached_hf_embeddings():
             encode_kwargs=encode_kwargs
         )
         
+        # Reduce precision on the loaded SentenceTransformer itself
+        # (langchain_huggingface keeps it in _client, langchain_community in client)
+        model = getattr(embeddings, '_client', None) or getattr(embeddings, 'client', None)
+        if model is not None:
+            try:
+                if device == 'cuda':
+                    # Use float16 for 2x speed boost on GPU
+                    model.half()
+                    print("⚡ Using FP16 precision for 2x speed boost")
+                elif HF_EMBEDDINGS_INT8:
+                    torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+                    print("⚡ Using dynamic INT8 quantization on CPU")
+            except Exception as e:
+                print(f"⚠️  Reduced precision not available, using FP32: {e}")
+        
         # Cache the embeddings instance
         _GLOBAL_HF_EMBEDDINGS_CACHE = embeddings
         print(f"✅ Successfully loaded model: {_GLOBAL_HF_MODEL_NAME}")
@@ -118,6 +154,23 @@ def get_cached_hf_embeddings():
         print("🔄 Falling back to OpenAI embeddings")
         return OpenAIEmbeddings()
 
+def read_metadata_count(metadata_file="./file_metadata.json"):
+    """Number of files recorded in the metadata file, read from its sidecar count file.
+    
+    Falls back to parsing the metadata JSON when the sidecar is missing or older than it.
+    Raises FileNotFoundError if the metadata file does not exist.
+    """
+    count_file = os.path.splitext(metadata_file)[0] + ".count"
+    try:
+        if os.path.getmtime(count_file) >= os.path.getmtime(metadata_file):
+            with open(count_file, 'r', encoding='utf-8') as f:
+                return int(f.read())
+    except (OSError, ValueError):
+        pass
+    
+    with open(metadata_file, 'r', encoding='utf-8') as f:
+        return len(json.load(f))
+
 def clear_global_hf_cache():
     """Clear the global HuggingFace embeddings cache."""
     global _GLOBAL_HF_EMBEDDINGS_CACHE
@@ -143,6 +196,7 @@ class Detect_and_Create_file_VStore:
         self.file_metadata = self.load_metadata()
         self.background_thread = None
         self.stop_background = False
+        self._exclude_lower = tuple(excl.lower() for excl in self.EXCLUDE_DIRS)
         
         # Initialize embeddings
         self.embeddings = self.get_embeddings()
@@ -170,6 +224,10 @@ class Detect_and_Create_file_VStore:
         try:
             with open(self.metadata_file, 'w', encoding='utf-8') as f:
                 json.dump(self.file_metadata, f, indent=2)
+            
+            # Sidecar so startup checks can get the file count without parsing the JSON
+            with open(os.path.splitext(self.metadata_file)[0] + ".count", 'w', encoding='utf-8') as f:
+                f.write(str(len(self.file_metadata)))
         except Exception as e:
             logging.error(f"Failed to save metadata file: {e}")
     
@@ -199,41 +257,117 @@ class Detect_and_Create_file_VStore:
                 current_info['size'] != stored_info.get('size', 0))
 
     def should_exclude(self, path):
-        return any(excl.lower() in path.lower() for excl in self.EXCLUDE_DIRS)
+        path_lower = path.lower()
+        return any(excl in path_lower for excl in self._exclude_lower)
 
-    def find_files_by_extension_parallel(self, root_dirs, extensions=None, only_modified=False):
-        """Find files by extension across multiple root directories in parallel."""
+    def find_files_by_extension_parallel(self, root_dirs, extensions=None, only_modified=False, found=None, cancel=None):
+        """Find files by extension across multiple root directories in parallel.
+        
+        Workers share one queue of directories instead of taking one root each,
+        so a single large drive is still spread over all of them. If `found` is a
+        queue, each directory's matches are also put on it as they are found.
+        Setting the `cancel` event stops the walk; directories still queued are skipped.
+        """
         extensions = extensions or self.ALLOWED_EXTS
-        all_matched = []
         
         logging.info(f"Starting parallel file scan across {len(root_dirs)} root directories")
         logging.info(f"Using {self.max_workers} workers")
         
-        def scan_single_root(root_path):
-            """Scan a single root directory."""
-            return self.find_files_by_extension(root_path, extensions, only_modified)
+        pending = queue.Queue()
+        for root in root_dirs:
+            pending.put((root, 0, not self.should_exclude(root)))
+        results = []
         
-        # Use ThreadPoolExecutor for I/O bound file scanning
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            # Submit all root directories for parallel processing
-            future_to_root = {
-                executor.submit(scan_single_root, root): root 
-                for root in root_dirs
-            }
-            
-            # Collect results as they complete
-            for future in future_to_root:
-                root = future_to_root[future]
+        def worker():
+            """Scan queued directories, queueing their subdirectories, until told to stop."""
+            # Per-worker result lists, merged at the end - no lock on the hot path
+            matched, new_files, modified_files = [], [], []
+            results.append((matched, new_files, modified_files))
+            while True:
+                item = pending.get()
                 try:
-                    matched_files = future.result()
-                    logging.info(f"Completed scanning {root}: {len(matched_files)} files found")
-                    all_matched.extend(matched_files)
+                    if item is None:
+                        return
+                    if cancel is not None and cancel.is_set():
+                        continue
+                    path, depth, descend = item
+                    before = len(matched)
+                    for subdir in self._scan_directory(path, depth, descend, extensions, only_modified,
+                                                       matched, new_files, modified_files):
+                        pending.put(subdir)
+                    if found is not None and len(matched) > before:
+                        found.put(matched[before:])
                 except Exception as e:
-                    logging.error(f"Error scanning {root}: {e}")
+                    logging.error(f"Error scanning {item[0]}: {e}")
+                finally:
+                    pending.task_done()
+        
+        workers = [threading.Thread(target=worker, daemon=True) for _ in range(self.max_workers)]
+        for thread in workers:
+            thread.start()
+        
+        # join() returns once every queued directory, including ones queued while scanning, is done
+        pending.join()
+        for _ in workers:
+            pending.put(None)
+        for thread in workers:
+            thread.join()
+        
+        all_matched = [fp for matched, _, _ in results for fp in matched]
+        if only_modified:
+            new_count = sum(len(new_files) for _, new_files, _ in results)
+            modified_count = sum(len(modified_files) for _, _, modified_files in results)
+            logging.info(f"Found {new_count} new files and {modified_count} modified files")
         
-        logging.info(f"Parallel scan completed: {len(all_matched)} total files found")
+        if cancel is not None and cancel.is_set():
+            logging.info(f"Parallel scan cancelled after {len(all_matched)} files")
+        else:
+            logging.info(f"Parallel scan completed: {len(all_matched)} total files found")
         return all_matched
 
+    def _scan_directory(self, path, depth, descend, extensions, only_modified, matched, new_files, modified_files):
+        """Scan one directory level, appending matching files to the given lists.
+        
+        Returns the (path, depth, descend) work items of the subdirectories to scan next.
+        Subdirectories are excluded by name - their parent was already checked.
+        """
+        subdirs = []
+        exclude_lower = self._exclude_lower
+        try:
+            entry_count = 0
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    entry_count += 1
+                    if entry_count % 5000 == 0:  # Log progress every 5000 entries
+                        logging.info(f"Processed {entry_count} entries in {path}")
+                    
+                    name = entry.name
+                    # is_dir(follow_symlinks=False) is answered from the cached d_type
+                    if entry.is_dir(follow_symlinks=False):
+                        if descend and depth < 15:  # Prevent runaway depth
+                            name_lower = name.lower()
+                            if not any(excl in name_lower for excl in exclude_lower):
+                                subdirs.append((entry.path, depth + 1, True))
+                    elif name[0] not in '~.' and name.lower().endswith(extensions) and entry.is_file():
+                        file_path = entry.path
+                        if only_modified:
+                            if self.is_file_modified(file_path):
+                                if file_path in self.file_metadata:
+                                    modified_files.append(file_path)
+                                else:
+                                    new_files.append(file_path)
+                                matched.append(file_path)
+                        else:
+                            matched.append(file_path)
+            
+            if entry_count > 0:
+                logging.debug(f"Scanned {entry_count} entries in {path}, found {len(matched)} matching files")
+            
+        except (PermissionError, OSError) as e:
+            logging.warning(f"Permission denied or OS error accessing {path}: {e}")
+        
+        return subdirs
+
     def find_files_by_extension(self, root_path, extensions=None, only_modified=False):
         """Find files by extension, optionally only modified files."""
         extensions = extensions or self.ALLOWED_EXTS
@@ -243,41 +377,12 @@ class Detect_and_Create_file_VStore:
         
         logging.info(f"Starting file scan in: {root_path}")
         
-        def scan_dir(path, depth=0):
-            if depth > 15:  # Prevent infinite recursion
-                return
-                
-            try:
-                entry_count = 0
-                for entry in os.scandir(path):
-                    entry_count += 1
-                    if entry_count % 5000 == 0:  # Log progress every 5000 entries
-                        logging.info(f"Processed {entry_count} entries in {path}")
-                    
-                    if entry.is_dir(follow_symlinks=False):
-                        if not self.should_exclude(entry.path):
-                            scan_dir(entry.path, depth + 1)
-                    elif entry.is_file() and entry.name.lower().endswith(extensions):
-                        if not (entry.name.startswith('~') or entry.name.startswith('.')):
-                            file_path = entry.path
-                            if only_modified:
-                                if self.is_file_modified(file_path):
-                                    if file_path in self.file_metadata:
-                                        modified_files.append(file_path)
-                                    else:
-                                        new_files.append(file_path)
-                                    matched.append(file_path)
-                            else:
-                                matched.append(file_path)
-                                
-                if entry_count > 0:
-                    logging.info(f"Scanned {entry_count} entries in {path}, found {len(matched)} matching files")
-                                
-            except (PermissionError, OSError) as e:
-                logging.warning(f"Permission denied or OS error accessing {path}: {e}")
-                return
-                
-        scan_dir(root_path)
+        # Iterative walk: a worklist of directories instead of one Python frame per level.
+        # An excluded root keeps its own files but is not descended (as before).
+        pending = [(root_path, 0, not self.should_exclude(root_path))]
+        while pending:
+            pending.extend(self._scan_directory(*pending.pop(), extensions, only_modified,
+                                                matched, new_files, modified_files))
         
         if only_modified:
             logging.info(f"Found {len(new_files)} new files and {len(modified_files)} modified files in {root_path}")
@@ -323,7 +428,7 @@ class Detect_and_Create_file_VStore:
                 
                 # DO NOT create a new directory - this causes the problem!
                 # Instead, raise an exception to stop the rebuild
-                raise Exception(f"Database is locked by another process. Please close all apps and try again.")
+                raise PermissionError(f"Database is locked by another process. Please close all apps and try again.") from e
                     
             except Exception as e:
                 logging.error(f"❌ Could not remove existing chroma db: {e}")
@@ -342,15 +447,14 @@ class Detect_and_Create_file_VStore:
         
         if deleted_files:
             try:
-                # Remove from vectorstore by filtering documents
-                for file_path in deleted_files:
-                    # Delete documents with matching metadata
-                    docs_to_delete = self.vectorstore.get(where={"path": file_path})
-                    if docs_to_delete and docs_to_delete.get('ids'):
-                        self.vectorstore.delete(ids=docs_to_delete['ids'])
+                # Delete by metadata filter - one call per chunk instead of a get + delete per file
+                for start in range(0, len(deleted_files), CHROMA_DELETE_BATCH_SIZE):
+                    chunk = deleted_files[start:start + CHROMA_DELETE_BATCH_SIZE]
+                    self.vectorstore._collection.delete(where={"path": {"$in": chunk}})
                     
                     # Remove from metadata
-                    del self.file_metadata[file_path]
+                    for file_path in chunk:
+                        del self.file_metadata[file_path]
                 
                 logging.info(f"Removed {len(deleted_files)} deleted files from vectorstore")
                 self.save_metadata()
@@ -358,59 +462,26 @@ class Detect_and_Create_file_VStore:
             except Exception as e:
                 logging.error(f"Error removing deleted files: {e}")
 
-    def update_vectorstore_incremental(self, file_paths):
-        """Update vectorstore with only new/modified files."""
-        if not file_paths:
-            logging.info("No files to update")
-            return self.vectorstore
-            
-        # Create Document objects for new/modified files
-        docs = []
-        for fp in file_paths:
-            doc = Document(page_content=fp, metadata={"path": fp})
-            docs.append(doc)
-            
-            # Update metadata
-            file_info = self.get_file_info(fp)
-            if file_info:
-                self.file_metadata[fp] = file_info
-
-        try:
-            if self.vectorstore is None:
-                # Create new vectorstore if it doesn't exist
-                embeddings = OpenAIEmbeddings()
-                self.vectorstore = Chroma(
-                    collection_name="paths", 
-                    embedding_function=embeddings, 
-                    persist_directory=self.persist_directory
-                )
-            
-            # Add new documents
-            self.vectorstore.add_documents(docs)
-            
-            # Save metadata
-            self.save_metadata()
-            
-            logging.info(f"Added {len(file_paths)} files to vectorstore")
-            return self.vectorstore
-            
-        except Exception as e:
-            logging.error(f"Error updating vectorstore: {e}")
-            return self.vectorstore
-
     def create_file_vectorstore(self, file_paths, retries=3, delay=1, incremental=False, batch_size=None):
         """Create vectorstore - now redirects to parallel implementation."""
         # Use parallel embedding for better performance
         return self.create_file_vectorstore_with_parallel_embedding(file_paths, retries, incremental)
 
-    def create_file_vectorstore_with_parallel_embedding(self, file_paths, retries=3, incremental=False):
-        """Create vectorstore with parallel embedding generation for maximum speed."""
+    def create_file_vectorstore_with_parallel_embedding(self, file_paths=None, retries=3, incremental=False, path_chunks=None):
+        """Create vectorstore with parallel embedding generation for maximum speed.
+        
+        Instead of `file_paths`, `path_chunks` may be a queue of path lists ended by None
+        (see find_files_by_extension_parallel), so embedding starts while the scan runs.
+        """
         if incremental:
             return self.update_vectorstore_incremental(file_paths)
             
-        total_files = len(file_paths)
+        total_files = None if path_chunks is not None else len(file_paths)
         logging.info(f"=" * 60)
-        logging.info(f"Creating vectorstore with {total_files} files using parallel embedding")
+        if total_files is None:
+            logging.info("Creating vectorstore from streamed scan results using parallel embedding")
+        else:
+            logging.info(f"Creating vectorstore with {total_files} files using parallel embedding")
         
         # Check if GPU is available
         import torch
@@ -433,35 +504,43 @@ class Detect_and_Create_file_VStore:
                 batch_size = 2000
                 num_workers = 2
         else:
-            # CPU: Smaller batches, more workers
+            # CPU: Smaller batches; a local model gets one encode thread, since every
+            # encode call already uses torch's full intra-op thread pool
             cpu_count = multiprocessing.cpu_count()
             logging.info(f"💻 Using CPU with {cpu_count} cores")
             batch_size = 500
-            num_workers = min(cpu_count, 8)  # Max 8 workers
+            if isinstance(self.embeddings, OpenAIEmbeddings):
+                num_workers = min(cpu_count, 8)  # Max 8 workers
+            else:
+                num_workers = 1
         
         logging.info(f"📊 Batch size: {batch_size}, Workers: {num_workers}")
         logging.info(f"=" * 60)
         
-        # Clean up before starting
-        self._remove_existing_db()
-        
-        # Create vectorstore
-        vs = Chroma(
-            collection_name="paths", 
-            embedding_function=self.embeddings, 
-            persist_directory=self.persist_directory
-        )
-        
-        from concurrent.futures import ThreadPoolExecutor, as_completed
+        from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
         
         def create_batches(file_list, batch_size):
             """Create batches from file list."""
             return [file_list[i:i + batch_size] for i in range(0, len(file_list), batch_size)]
         
+        def stream_batches(chunks, batch_size):
+            """Regroup queued path lists into batches until the None sentinel, counting total_files."""
+            nonlocal total_files
+            total_files = 0
+            buffer = []
+            while (chunk := chunks.get()) is not None:
+                total_files += len(chunk)
+                buffer.extend(chunk)
+                while len(buffer) >= batch_size:
+                    yield buffer[:batch_size]
+                    del buffer[:batch_size]
+            if buffer:
+                yield buffer
+        
         def process_batch(batch, batch_id):
-            """Process a single batch of files."""
+            """Embed a single batch of files outside Chroma."""
             try:
-                docs = [Document(page_content=fp, metadata={"path": fp}) for fp in batch]
+                embeddings = self.embeddings.embed_documents(batch)
                 
                 # Update metadata
                 batch_metadata = {}
@@ -472,7 +551,8 @@ class Detect_and_Create_file_VStore:
                 
                 return {
                     'success': True,
-                    'docs': docs,
+                    'paths': batch,
+                    'embeddings': embeddings,
                     'metadata': batch_metadata,
                     'batch_id': batch_id,
                     'count': len(batch)
@@ -485,11 +565,34 @@ class Detect_and_Create_file_VStore:
                     'batch_id': batch_id
                 }
         
-        # Create all batches
-        all_batches = create_batches(file_paths, batch_size)
-        total_batches = len(all_batches)
+        if path_chunks is not None:
+            # Batches arrive as the scan finds files; encode() still length-sorts within each one
+            all_batches = stream_batches(path_chunks, batch_size)
+            total_batches = None
+            logging.info(f"Processing streamed batches with {num_workers} parallel workers")
+        else:
+            # Create all batches - similar-length paths together keep embedding batches uniform
+            all_batches = create_batches(sorted(file_paths, key=len), batch_size)
+            total_batches = len(all_batches)
+            logging.info(f"Processing {total_batches} batches with {num_workers} parallel workers")
+        
+        if path_chunks is not None:
+            # Wait for the first batch before wiping the old index - keep it if the scan finds nothing
+            first_batch = next(all_batches, None)
+            if first_batch is None:
+                logging.warning("⚠️  Scan produced no files - keeping the existing vectorstore")
+                return None
+            all_batches = itertools.chain([first_batch], all_batches)
+        
+        # Clean up before starting
+        self._remove_existing_db()
         
-        logging.info(f"Processing {total_batches} batches with {num_workers} parallel workers")
+        # Create vectorstore
+        vs = Chroma(
+            collection_name="paths", 
+            embedding_function=self.embeddings, 
+            persist_directory=self.persist_directory
+        )
         
         start_time = time.time()
         processed_count = 0
@@ -497,23 +600,41 @@ class Detect_and_Create_file_VStore:
         
         # Use ThreadPoolExecutor for parallel batch processing
         with ThreadPoolExecutor(max_workers=num_workers) as executor:
-            # Submit all batches
-            future_to_batch = {
-                executor.submit(process_batch, batch, i): i 
-                for i, batch in enumerate(all_batches)
-            }
+            future_to_batch = {}
+            
+            def completed_futures():
+                """Submit batches as they become available, yielding finished futures.
+                
+                At most two batches per worker are in flight, which bounds memory held
+                in unconsumed embeddings and lets streamed batches be inserted early.
+                """
+                for i, batch in enumerate(all_batches):
+                    future_to_batch[executor.submit(process_batch, batch, i)] = i
+                    if len(future_to_batch) >= num_workers * 2:
+                        done, _ = wait(future_to_batch, return_when=FIRST_COMPLETED)
+                        yield from done
+                yield from as_completed(list(future_to_batch))
             
             # Process results as they complete
-            for future in as_completed(future_to_batch):
-                batch_id = future_to_batch[future]
+            for future in completed_futures():
+                batch_id = future_to_batch.pop(future)
                 
                 try:
                     result = future.result()
                     
                     if result['success']:
-                        # Add documents to vectorstore
+                        # Bulk insert precomputed vectors directly into the collection
                         try:
-                            vs.add_documents(result['docs'])
+                            paths = result['paths']
+                            vectors = result['embeddings']
+                            for start in range(0, len(paths), CHROMA_INSERT_BATCH_SIZE):
+                                end = start + CHROMA_INSERT_BATCH_SIZE
+                                vs._collection.add(
+                                    ids=[str(uuid.uuid4()) for _ in paths[start:end]],
+                                    embeddings=vectors[start:end],
+                                    metadatas=[{"path": fp} for fp in paths[start:end]],
+                                    documents=paths[start:end]
+                                )
                         except Exception as add_error:
                             logging.error(f"❌ Failed to add documents for batch {batch_id}: {add_error}")
                             failed_count += 1
@@ -533,14 +654,21 @@ class Detect_and_Create_file_VStore:
                         
                         elapsed = time.time() - start_time
                         rate = processed_count / elapsed if elapsed > 0 else 0
-                        progress = (batch_id + 1) / total_batches * 100
                         
-                        logging.info(
-                            f"📈 Progress: {progress:.1f}% | "
-                            f"Batch {batch_id + 1}/{total_batches} | "
-                            f"Processed: {processed_count:,}/{total_files:,} files | "
-                            f"Speed: {rate:.1f} files/sec"
-                        )
+                        if total_batches is None:
+                            logging.info(
+                                f"📈 Batch {batch_id + 1} | "
+                                f"Processed: {processed_count:,} files so far | "
+                                f"Speed: {rate:.1f} files/sec"
+                            )
+                        else:
+                            progress = (batch_id + 1) / total_batches * 100
+                            logging.info(
+                                f"📈 Progress: {progress:.1f}% | "
+                                f"Batch {batch_id + 1}/{total_batches} | "
+                                f"Processed: {processed_count:,}/{total_files:,} files | "
+                                f"Speed: {rate:.1f} files/sec"
+                            )
                     else:
                         failed_count += 1
                         logging.error(f"❌ Batch {batch_id} failed: {result.get('error')}")
@@ -599,36 +727,47 @@ class Detect_and_Create_file_VStore:
                 persist_directory=self.persist_directory
             )
         
-        # Process in batches
-        for i in range(0, total_files, batch_size):
-            batch = file_paths[i:i + batch_size]
-            batch_num = (i // batch_size) + 1
-            total_batches = (total_files + batch_size - 1) // batch_size
-            
-            logging.info(f"Processing incremental batch {batch_num}/{total_batches}")
-            start_time = time.time()
-            
-            docs = [Document(page_content=fp, metadata={"path": fp}) for fp in batch]
+        # Similar-length paths together keep tokenizer padding per batch low;
+        # order is irrelevant since every document is keyed by its path metadata
+        file_paths = sorted(file_paths, key=len)
+        
+        batches = [file_paths[i:i + batch_size] for i in range(0, total_files, batch_size)]
+        total_batches = len(batches)
+        
+        # OpenAI calls are network-bound, so keep several batches in flight;
+        # a local model already spreads one batch across every core
+        num_workers = OPENAI_EMBED_CONCURRENCY if isinstance(self.embeddings, OpenAIEmbeddings) else 1
+        
+        start_time = time.time()
+        processed_count = 0
+        
+        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+            futures = [executor.submit(self.embeddings.embed_documents, batch) for batch in batches]
             
-            try:
-                self.vectorstore.add_documents(docs)
-                
-                # Update metadata
-                for fp in batch:
-                    file_info = self.get_file_info(fp)
-                    if file_info:
-                        self.file_metadata[fp] = file_info
-                
-                batch_time = time.time() - start_time
-                files_per_sec = len(batch) / batch_time if batch_time > 0 else 0
-                logging.info(f"Incremental batch {batch_num} completed in {batch_time:.2f}s ({files_per_sec:.1f} files/sec)")
-                
-                # Minimal delay
-                if batch_num < total_batches:
-                    time.sleep(0.1 if self.use_hf_embeddings else 0.5)
+            # Insert in submission order while later batches are still embedding
+            for batch_num, (batch, future) in enumerate(zip(batches, futures), 1):
+                try:
+                    vectors = future.result()
+                    self.vectorstore._collection.add(
+                        ids=[str(uuid.uuid4()) for _ in batch],
+                        embeddings=vectors,
+                        metadatas=[{"path": fp} for fp in batch],
+                        documents=batch
+                    )
                     
-            except Exception as e:
-                logging.error(f"Failed to process incremental batch {batch_num}: {e}")
+                    # Update metadata
+                    for fp in batch:
+                        file_info = self.get_file_info(fp)
+                        if file_info:
+                            self.file_metadata[fp] = file_info
+                    
+                    processed_count += len(batch)
+                    elapsed = time.time() - start_time
+                    files_per_sec = processed_count / elapsed if elapsed > 0 else 0
+                    logging.info(f"Incremental batch {batch_num}/{total_batches} completed ({files_per_sec:.1f} files/sec)")
+                    
+                except Exception as e:
+                    logging.error(f"Failed to process incremental batch {batch_num}: {e}")
         
         self.save_metadata()
         logging.info(f"Incremental update completed for {total_files} files")
@@ -724,22 +863,36 @@ class Detect_and_Create_file_VStore:
             logging.info("🔄 PERFORMING FULL REBUILD")
             logging.info("=" * 60)
             
-            # Use parallel scanning for multiple drives
-            if len(root_dirs) > 1:
-                all_paths = self.find_files_by_extension_parallel(root_dirs)
-            else:
-                # Single drive, use regular scanning
-                all_paths = []
-                for root in root_dirs:
+            # Embed while scanning: scan workers hand their matches to the embedder through a bounded queue
+            found = queue.Queue(maxsize=SCAN_QUEUE_MAXSIZE)
+            stop_scan = threading.Event()
+            all_paths = []
+            scan_time = 0.0
+            
+            def scan():
+                nonlocal scan_time
+                try:
+                    all_paths.extend(self.find_files_by_extension_parallel(root_dirs, found=found, cancel=stop_scan))
+                except Exception as e:
+                    logging.warning(f"⚠️  File scan failed: {e}")
+                finally:
+                    scan_time = time.time() - start_time
+                    found.put(None)
+            
+            scanner = threading.Thread(target=scan, name="file-scan", daemon=True)
+            scanner.start()
+            try:
+                result = self.create_file_vectorstore_with_parallel_embedding(path_chunks=found)
+            finally:
+                # If embedding stopped early, stop the walk and drain the queue so blocked scan workers can finish
+                stop_scan.set()
+                while scanner.is_alive():
                     try:
-                        logging.info(f"🔍 Scanning drive: {root}")
-                        paths = self.find_files_by_extension(root)
-                        logging.info(f"✅ Found {len(paths):,} files in {root}")
-                        all_paths.extend(paths)
-                    except Exception as e:
-                        logging.warning(f"⚠️  Skipping drive {root} due to error: {e}")
+                        found.get(timeout=0.5)
+                    except queue.Empty:
+                        pass
+                scanner.join()
             
-            scan_time = time.time() - start_time
             logging.info(f"⏱️  Scanning completed in {scan_time:.2f} seconds")
             logging.info(f"📊 Found {len(all_paths):,} matching files total")
             
@@ -747,17 +900,13 @@ class Detect_and_Create_file_VStore:
                 logging.warning("⚠️  No files found during scan - this might indicate a configuration issue")
                 return None
             
-            embedding_start = time.time()
-            result = self.create_file_vectorstore(all_paths, incremental=False)
-            embedding_time = time.time() - embedding_start
-            
             total_time = time.time() - start_time
             logging.info(f"=" * 60)
             logging.info(f"✅ FULL REBUILD COMPLETED")
             logging.info(f"=" * 60)
             logging.info(f"  ⏱️  Total time: {total_time:.2f}s ({total_time/60:.1f} minutes)")
-            logging.info(f"  🔍 Scanning: {scan_time:.2f}s")
-            logging.info(f"  🧠 Embedding: {embedding_time:.2f}s")
+            logging.info(f"  🔍 Scanning: {scan_time:.2f}s (overlapped with embedding)")
+            logging.info(f"  🧠 Embedding finished {total_time - scan_time:.2f}s after the scan")
             logging.info(f"  🚀 Average speed: {len(all_paths) / total_time:.1f} files/second")
             logging.info(f"=" * 60)
             
@@ -812,10 +961,10 @@ class Detect_and_Create_file_VStore:
         """Get existing vectorstore without rebuilding."""
         if self.vectorstore is None:
             try:
-                embeddings = OpenAIEmbeddings()
+                # Same embedding model the index was built with, already loaded in __init__
                 self.vectorstore = Chroma(
                     collection_name="paths", 
-                    embedding_function=embeddings, 
+                    embedding_function=self.embeddings, 
                     persist_directory=self.persist_directory
                 )
             except Exception as e: